@@ -1,28 +1,74 @@
 # contour_controller.py
 from __future__ import annotations
 
-from typing import List, Optional
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
 
 import cv2
 import numpy as np
-from PySide6.QtCore import QObject
+from PySide6.QtCore import QObject, Signal
 from PySide6.QtWidgets import QGraphicsScene
 
+from controllers.load_worker import LoadWorker, start_in_thread, stop_threads
+from utils.compositor import ProgressCallback
+from utils.threshold import Thresholds, estimate_thresholds
 from views.scene_items.contour_item import ContourItem
 
+# Escaneos (hash + parámetros) cuyos contornos se recuerdan
+_CACHE_ENTRIES = 8
+# Se hashea una de cada N filas del escaneo (el ruido del escáner basta para distinguirlos)
+_HASH_ROW_STEP = 16
+
+
+class _DetectParams(NamedTuple):
+    """Instantánea de los parámetros de detección (clave de caché y entrada del hilo)."""
+
+    min_area: float
+    blur_ksize: int
+    threshold_mode: str
+    threshold_tile: int
+    threshold_min_contrast: float
+    detect_scale: int
+    detect_tolerance_px: float
+
 
 class ContourController(QObject):
     """
     Detecta contornos desde el background del ScanTableController
     y gestiona sus ContourItem en la escena.
-    Mantener simple: sin hilos, sin estados extra.
+    La detección corre en un QThread y sus contornos se recuerdan por hash del
+    escaneo + parámetros: volver a un escaneo ya visto los reutiliza al instante.
     """
 
+    contours_changed = Signal()
+
     def __init__(self, scene: Optional[QGraphicsScene] = None, parent=None) -> None:
         super().__init__(parent)
         self._scene: Optional[QGraphicsScene] = scene
         self._items: List[ContourItem] = []
         self._min_area: float = 40000.0  # píxeles^2; ajustable si se necesita
+        self.blur_ksize: int = 5          # lado (impar) del desenfoque gaussiano
+        # Detección sobre una copia reducida N veces y refinada por ROI a resolución
+        # completa (1 = todo a resolución completa)
+        self.detect_scale: int = 4
+        # Desvío extra (px) tolerado entre el contorno refinado y su versión reducida
+        self.detect_tolerance_px: float = 2.0
+        # 'otsu': un umbral global | 'tiled': Otsu por mosaico de threshold_tile px,
+        # interpolado (escaneos grandes o con iluminación despareja)
+        self.threshold_mode: str = "otsu"
+        self.threshold_tile: int = 1024
+        # Diferencia mínima de gris entre fondo y objeto para confiar en el Otsu de un mosaico
+        self.threshold_min_contrast: float = 20.0
+        # {(hash del escaneo, parámetros): contornos}, LRU
+        self._cache: "OrderedDict[tuple, List[np.ndarray]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._digest_memo: tuple | None = None   # (weakref al arreglo, hash)
+        # Detección en segundo plano en curso y contador para descartar resultados viejos
+        self._detecting: LoadWorker | None = None
+        self._detect_token = 0
 
     # --- Wiring desde MainWindow ---
     def attach_to_scene(self, scene: Optional[QGraphicsScene]) -> None:
@@ -41,11 +87,51 @@ class ContourController(QObject):
         if self._scene is None:
             return
         image = self._get_background_np(scan_ctrl)
+        self.cancel_detection()
         if image is None:
             self.clear()
+            self.contours_changed.emit()
             return
-        items = self._detect_to_items(image)
-        self._rebuild_items(items)
+
+        params = self._detect_params()
+        digest = self._known_digest(image)
+        cached = self._cache_get((digest, params)) if digest is not None else None
+        if cached is not None:
+            # Mismo escaneo y parámetros: sin hilo ni detección
+            self._show_contours(cached)
+            return
+
+        self.clear()  # los contornos anteriores ya no corresponden
+        self.contours_changed.emit()
+        self._detect_token += 1
+        worker = LoadWorker(self._detect_token, lambda progress: self._detect_cached(image, params, progress))
+        worker.finished.connect(self._on_detected)
+        self._detecting = worker
+        start_in_thread(self, worker)
+
+    def is_detecting(self) -> bool:
+        return self._detecting is not None
+
+    def cancel_detection(self) -> None:
+        if self._detecting is not None:
+            self._detecting.cancel()
+            self._detecting = None
+            self._detect_token += 1
+
+    def shutdown(self) -> None:
+        """Cancela la detección en curso y espera sus hilos (al cerrar la ventana)."""
+        self.cancel_detection()
+        stop_threads(self)
+
+    def _on_detected(self, token: int, contours) -> None:
+        if token != self._detect_token:
+            return  # escaneo reemplazado mientras se detectaba
+        self._detecting = None
+        self._show_contours(contours or [])
+
+    def _show_contours(self, contours: List[np.ndarray]) -> None:
+        self._rebuild_items(self._contours_to_items(contours))
+        self.contours_changed.emit()
 
     def _get_background_np(self, scan_ctrl) -> Optional[np.ndarray]:
         # Preferir un método público si existe
@@ -56,15 +142,94 @@ class ContourController(QObject):
         model = getattr(scan_ctrl, "_model", None)
         return getattr(model, "scan_table_image", None) if model is not None else None
 
+    # --- Caché de contornos por escaneo ---
+    def _detect_params(self) -> _DetectParams:
+        return _DetectParams(
+            float(self._min_area), int(self.blur_ksize),
+            self.threshold_mode, int(self.threshold_tile), float(self.threshold_min_contrast),
+            int(self.detect_scale or 1), float(self.detect_tolerance_px),
+        )
+
+    def _detect_cached(
+        self,
+        image: np.ndarray,
+        params: _DetectParams,
+        progress: ProgressCallback | None = None,
+    ) -> List[np.ndarray]:
+        """
+        Contornos de `image` desde la caché o detectados (apto para otro hilo). Solo usa
+        `params`, no los atributos vivos: se guardan bajo la clave con que se detectaron.
+        `progress` puede lanzar para cancelar (la detección a medias no se guarda).
+        """
+        key = (self._digest(image), params)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        contours = self._detect(image, params, progress)
+        with self._cache_lock:
+            self._cache[key] = contours
+            while len(self._cache) > _CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return contours
+
+    def _cache_get(self, key: tuple) -> Optional[List[np.ndarray]]:
+        with self._cache_lock:
+            contours = self._cache.get(key)
+            if contours is not None:
+                self._cache.move_to_end(key)
+            return contours
+
+    def _known_digest(self, image: np.ndarray) -> Optional[str]:
+        """Hash ya calculado para este mismo arreglo (sin recalcularlo), o None."""
+        memo = self._digest_memo
+        if memo is not None and memo[0]() is image:
+            return memo[1]
+        return None
+
+    def _digest(self, image: np.ndarray) -> str:
+        digest = self._known_digest(image)
+        if digest is None:
+            h = hashlib.blake2b(digest_size=20)
+            h.update(repr((image.shape, image.dtype.str)).encode())
+            h.update(np.ascontiguousarray(image[::_HASH_ROW_STEP]).data)
+            h.update(np.ascontiguousarray(image[-1]).data)
+            digest = h.hexdigest()
+            self._digest_memo = (weakref.ref(image), digest)
+        return digest
+
     # --- Detección y construcción de items ---
-    def _detect_to_items(self, image: np.ndarray) -> List[ContourItem]:
-        if image.ndim == 3 and image.shape[2] >= 3:
-            gray = cv2.cvtColor(image[..., :3], cv2.COLOR_RGB2GRAY)
-        else:
-            gray = image.copy()
+    def _detect(
+        self,
+        image: np.ndarray,
+        params: _DetectParams,
+        progress: ProgressCallback | None = None,
+    ) -> List[np.ndarray]:
+        def step(done: int, total: int) -> None:
+            if progress is not None:
+                progress(done, total)
 
-        gray = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, thr = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        cnts = None
+        scale = params.detect_scale
+        if scale > 1 and min(image.shape[:2]) >= scale * 64:
+            cnts = self._detect_multiscale(image, scale, params, step)
+        if cnts is None:
+            step(0, 1)
+            cnts = self._detect_contours(_to_gray(image), params)
+            step(1, 1)
+        return cnts
+
+    def _contours_to_items(self, cnts: List[np.ndarray]) -> List[ContourItem]:
+        items = ContourItem.from_cv_contours(cnts)
+        for it in items:
+            it.controller = self
+            it.setZValue(10.0)  # por encima del background
+        return items
+
+    def _detect_contours(self, gray: np.ndarray, params: _DetectParams) -> List[np.ndarray]:
+        """Detección a resolución completa: desenfoque, umbral y contornos externos."""
+        k = params.blur_ksize
+        gray = cv2.GaussianBlur(gray, (k, k), 0)
+        thr = _thresholds(gray, gray.shape[:2], 1, params).mask(gray)
 
         # Asegurar objetos en blanco
         white = int(np.count_nonzero(thr)); black = thr.size - white
@@ -72,15 +237,64 @@ class ContourController(QObject):
             thr = cv2.bitwise_not(thr)
 
         cnts, _ = cv2.findContours(thr, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = [c for c in cnts if cv2.contourArea(c) >= self._min_area]
-        items: List[ContourItem] = []
-        for c in cnts:
-            # Se asume que ContourItem expone un helper de construcción desde cv-contour
-            it = ContourItem.from_cv_contour(c)
-            it.controller = self
-            it.setZValue(10.0)  # por encima del background
-            items.append(it)
-        return items
+        return [c for c in cnts if cv2.contourArea(c) >= params.min_area]
+
+    def _detect_multiscale(
+        self,
+        image: np.ndarray,
+        scale: int,
+        params: _DetectParams,
+        step: ProgressCallback,
+    ) -> Optional[List[np.ndarray]]:
+        """
+        Detecta sobre una copia reducida `scale` veces (umbrales incluidos) y
+        rehace cada contorno a resolución completa solo dentro de su ROI, con el mismo
+        desenfoque que la imagen completa. None si algún objeto refinado se aleja de su
+        versión reducida más de 2*scale + detect_tolerance_px (objetos fundidos o
+        partidos en la reducción): entonces conviene la detección completa.
+        `step(roi, total)` se llama entre ROIs (si lanza, la detección se cancela).
+        """
+        h, w = image.shape[:2]
+        # Diezmado simple (el desenfoque posterior basta para el ruido): casi gratis
+        # frente a INTER_AREA, y el detalle fino lo recupera el refinado
+        k = params.blur_ksize
+        small = cv2.GaussianBlur(_to_gray(image[::scale, ::scale]), (k, k), 0)
+        sx = sy = float(scale)
+        thresholds = _thresholds(small, (h, w), scale, params)
+        thr = thresholds.mask(small, step=scale)
+        invert = int(np.count_nonzero(thr)) > thr.size - int(np.count_nonzero(thr))
+        if invert:
+            thr = cv2.bitwise_not(thr)
+        coarse, _ = cv2.findContours(thr, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        tol = 2 * scale + params.detect_tolerance_px
+        pad = int(np.ceil(tol)) + k // 2
+        min_small = 0.5 * params.min_area / (sx * sy)
+        out: List[np.ndarray] = []
+        for i, c in enumerate(coarse):
+            step(i, len(coarse))
+            if cv2.contourArea(c) < min_small:
+                continue
+            x, y, cw, ch = cv2.boundingRect(c)
+            ex0, ey0, ex1, ey1 = x * sx, y * sy, (x + cw) * sx, (y + ch) * sy
+            x0, y0 = max(0, int(ex0) - pad), max(0, int(ey0) - pad)
+            x1, y1 = min(w, int(np.ceil(ex1)) + pad), min(h, int(np.ceil(ey1)) + pad)
+
+            roi = _blurred_roi(image, x0, y0, x1, y1, k)
+            rthr = thresholds.mask(roi, x0, y0)
+            if invert:
+                rthr = cv2.bitwise_not(rthr)
+            found, _ = cv2.findContours(rthr, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+            if not found:
+                return None
+            best = max(found, key=cv2.contourArea)
+            bx, by, bw, bh = cv2.boundingRect(best)
+            if max(abs(bx - ex0), abs(by - ey0), abs(bx + bw - ex1), abs(by + bh - ey1)) > tol:
+                return None
+            if cv2.contourArea(best) >= params.min_area:
+                out.append(best)
+        step(len(coarse), len(coarse))
+        return out
 
     # --- Gestión simple de items en escena ---
     def _rebuild_items(self, new_items: List[ContourItem]) -> None:
@@ -111,3 +325,40 @@ class ContourController(QObject):
     # --- API mínima pública ---
     def items(self) -> List[ContourItem]:
         return list(self._items)
+
+
+# --- Helpers internos ---
+
+def _thresholds(gray: np.ndarray, shape, step: int, params: _DetectParams) -> Thresholds:
+    return estimate_thresholds(
+        gray, shape, step,
+        mode=params.threshold_mode,
+        tile=params.threshold_tile,
+        min_contrast=params.threshold_min_contrast,
+    )
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3 and image.shape[2] >= 3:
+        return cv2.cvtColor(image[..., :3], cv2.COLOR_RGB2GRAY)
+    return image.reshape(image.shape[:2]).copy()
+
+
+def _blurred_roi(image: np.ndarray, x0: int, y0: int, x1: int, y1: int, ksize: int) -> np.ndarray:
+    """
+    Gris desenfocado de [y0:y1, x0:x1], idéntico al recorte de desenfocar la imagen
+    completa: se toma contexto real del radio del kernel y solo en los bordes
+    verdaderos de la imagen se usa el reflejo de cv2.
+    """
+    r = ksize // 2
+    h, w = image.shape[:2]
+    cx0, cy0 = max(0, x0 - r), max(0, y0 - r)
+    cx1, cy1 = min(w, x1 + r), min(h, y1 + r)
+    gray = _to_gray(image[cy0:cy1, cx0:cx1])
+    # Reflejo solo hacia los bordes de la imagen; hacia adentro, el contexto ya está
+    top, left = r - (y0 - cy0), r - (x0 - cx0)
+    bottom, right = r - (cy1 - y1), r - (cx1 - x1)
+    if top or left or bottom or right:
+        gray = cv2.copyMakeBorder(gray, top, bottom, left, right, cv2.BORDER_REFLECT_101)
+    blur = cv2.GaussianBlur(gray, (ksize, ksize), 0, borderType=cv2.BORDER_REFLECT_101)
+    return blur[r:r + (y1 - y0), r:r + (x1 - x0)]
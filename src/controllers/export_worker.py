@@ -0,0 +1,198 @@
+"""Background export of the composed workspace to TIFF."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Hashable, List, Optional
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal, Slot
+
+from utils.compositor import (
+    IncrementalCompositor,
+    Placement,
+    ProgressCallback,
+    RotatedPatchCache,
+    band_rows_for,
+    compose_tiled,
+    iter_bands,
+    resolve_workers,
+)
+from utils.file_manager import DEFAULT_TIFF_TILE, create_result_memmap, save_result, save_result_bands
+
+
+class ExportCancelled(Exception):
+    """Lanzada desde el callback de progreso cuando se cancela la exportación."""
+
+
+class ExportJob:
+    """
+    Instantánea de una exportación: imagen base, colocaciones ya calculadas,
+    forma del canvas, tags y opciones. No toca ningún objeto Qt, así que run()
+    puede ejecutarse fuera del hilo de la GUI mientras la escena sigue editable.
+    `src` puede ser la función que lee la imagen base (ImageModel.pixels_source):
+    entonces se lee al empezar run() y queda en `src`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        src: np.ndarray | Callable[[], np.ndarray],
+        placements: List[Placement],
+        shape: tuple[int, ...],
+        metadata: dict,
+        mode: str = "streaming",              # 'streaming' | 'full' | 'memmap' | 'incremental'
+        band_rows: int | None = None,
+        tile: tuple[int, int] | None = None,
+        compression: str | None = None,
+        predictor: bool = True,
+        cache: RotatedPatchCache | None = None,
+        workers: int | None = None,
+        incremental: IncrementalCompositor | None = None,
+        keys: List[Hashable] | None = None,
+    ) -> None:
+        self.path = Path(path)
+        # Maestro aún sin leer (previsualización desde la caché): se lee en run()
+        self.src_loader = src if callable(src) else None
+        self.src: Optional[np.ndarray] = None if callable(src) else src
+        self.placements = placements
+        self.shape = tuple(shape)
+        self.metadata = dict(metadata)
+        self.mode = mode
+        self.band_rows = band_rows
+        self.tile = tile
+        self.compression = compression
+        self.predictor = predictor
+        self.cache = cache
+        self.workers = workers
+        # Modo 'incremental': canvas retenido y clave de item por colocación
+        self.incremental = incremental
+        self.keys = keys
+        self.stats: Optional[dict] = None
+        # Motivo del último fallo (None si terminó bien o se canceló)
+        self.error: Optional[str] = None
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self, progress: ProgressCallback | None = None) -> bool:
+        """
+        Compone y escribe el TIF. False si falla o se cancela (motivo en `error`).
+        Se escribe en un temporal del mismo directorio que reemplaza al destino solo
+        al terminar bien: un fallo o una cancelación no deja archivo a medias ni
+        pisa el que ya existía.
+        """
+        def step(done: int, total: int) -> None:
+            if self._cancel.is_set():
+                raise ExportCancelled()
+            if progress is not None:
+                progress(done, total)
+
+        self.stats = None
+        self.error = None
+        tmp = self.path.with_name(f"{self.path.stem}.{os.getpid()}.{threading.get_ident()}.tmp{self.path.suffix}")
+        t0 = time.perf_counter()
+        try:
+            if self.src is None:
+                self.src = self.src_loader()
+            self._write(tmp, step)
+            if self._cancel.is_set():
+                raise ExportCancelled()
+            os.replace(tmp, self.path)
+        except Exception as exc:
+            # Cancelación o error de composición/escritura: se reporta como fallo, nunca se
+            # propaga al hilo
+            if not self._cancel.is_set():
+                self.error = str(exc) or type(exc).__name__
+            return False
+        finally:
+            # Tras os.replace ya no existe; en cualquier otro caso (fallo, cancelación o
+            # aborto del hilo) no debe quedar en disco
+            tmp.unlink(missing_ok=True)
+
+        seconds = max(time.perf_counter() - t0, 1e-9)
+        raw_bytes = int(np.prod(self.shape)) * self.src.dtype.itemsize
+        file_bytes = self.path.stat().st_size
+        self.stats = {
+            "seconds": seconds,
+            "raw_bytes": raw_bytes,
+            "file_bytes": file_bytes,
+            "ratio": (raw_bytes / file_bytes) if file_bytes else 0.0,
+            "mb_per_s": raw_bytes / seconds / 1e6,
+        }
+        return True
+
+    def _write(self, path: Path, step: ProgressCallback) -> None:
+        encoding = {
+            "compression": self.compression,
+            "predictor": self.predictor,
+            "maxworkers": resolve_workers(self.workers),
+        }
+        if self.mode == "memmap":
+            canvas = create_result_memmap(path, self.shape, self.src.dtype, **self.metadata)
+            try:
+                compose_tiled(canvas, self.src, self.placements, cache=self.cache,
+                              workers=self.workers, progress=step)
+                canvas.flush()
+            finally:
+                del canvas
+            return
+
+        if self.mode == "incremental":
+            # Solo se recomponen los mosaicos afectados desde la exportación anterior
+            canvas = self.incremental.compose(
+                self.src, dict(zip(self.keys, self.placements)), self.shape,
+                cache=self.cache, workers=self.workers, progress=step,
+            )
+            save_result(path, canvas, tile=self.tile, **encoding, **self.metadata)
+            return
+
+        if self.mode == "full":
+            canvas = np.zeros(self.shape, dtype=self.src.dtype)  # CMYK blanco = 0
+            compose_tiled(canvas, self.src, self.placements, cache=self.cache,
+                          workers=self.workers, progress=step)
+            save_result(path, canvas, tile=self.tile, **encoding, **self.metadata)
+            return
+
+        tile = self.tile
+        if tile is None and self.compression:
+            tile = DEFAULT_TIFF_TILE
+        rows = int(self.band_rows) if self.band_rows else band_rows_for(self.shape, self.src.dtype)
+        if tile is not None:
+            # Bandas con un número entero de filas de mosaicos
+            rows = max(1, rows // int(tile[0])) * int(tile[0])
+        bands = iter_bands(self.src, self.placements, self.shape, rows,
+                           self.cache, self.workers, progress=step)
+        save_result_bands(
+            path, bands, self.shape, self.src.dtype, rows, tile=tile,
+            **encoding, **self.metadata,
+        )
+
+
+class ExportWorker(QObject):
+    """Ejecuta un ExportJob en un QThread y publica progreso y resultado por señales."""
+
+    progress = Signal(int, int)   # hechos, total (bandas o mosaicos)
+    finished = Signal(bool)
+
+    def __init__(self, job: ExportJob) -> None:
+        super().__init__()
+        self.job = job
+
+    @Slot()
+    def run(self) -> None:
+        ok = self.job.run(self.progress.emit)
+        self.finished.emit(ok)
+
+    def cancel(self) -> None:
+        # Llamar directo desde la GUI (no como slot encolado: el hilo está ocupado en run);
+        # solo marca el evento, que se comprueba entre bandas/mosaicos.
+        self.job.cancel()
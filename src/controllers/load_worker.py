@@ -0,0 +1,85 @@
+"""Background loading of artwork and scan tables off the GUI thread."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable
+
+from shiboken6 import isValid
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+from utils.compositor import ProgressCallback
+
+
+class LoadCancelled(Exception):
+    """Lanzada desde el callback de progreso cuando se cancela la carga."""
+
+
+class LoadWorker(QObject):
+    """
+    Ejecuta `task(progress)` en un QThread. `task` solo lee/decodifica (sin QPixmap ni
+    items de escena); el resultado se aplica al modelo en el hilo de la GUI.
+    `token` identifica la carga para descartar resultados de cargas ya reemplazadas.
+    """
+
+    progress = Signal(int, int)      # hechos, total
+    finished = Signal(int, object)   # token, resultado (None si falló o se canceló)
+
+    def __init__(self, token: int, task: Callable[[ProgressCallback], Any]) -> None:
+        super().__init__()
+        self.token = token
+        self._task = task
+        self._cancel = threading.Event()
+
+    @Slot()
+    def run(self) -> None:
+        try:
+            result = self._task(self._step)
+        except Exception:
+            # Cancelación o error de lectura: se reporta como resultado vacío
+            result = None
+        if self._cancel.is_set():
+            result = None
+        self.finished.emit(self.token, result)
+
+    def cancel(self) -> None:
+        # Llamar directo desde la GUI; se comprueba en cada paso de progreso.
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _step(self, done: int, total: int) -> None:
+        if self._cancel.is_set():
+            raise LoadCancelled()
+        self.progress.emit(done, total)
+
+
+def start_in_thread(parent: QObject, worker: QObject) -> QThread:
+    """
+    Mueve `worker` (con slot run() y señal finished) a un QThread hijo de `parent`
+    y lo arranca; hilo y worker se liberan solos al terminar. Conectar `finished`
+    antes de llamar: si no, un worker muy rápido puede terminar sin que nadie lo oiga.
+    """
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
+
+
+def stop_threads(parent: QObject) -> None:
+    """
+    Espera a que terminen los QThread lanzados con start_in_thread bajo `parent`
+    (cancelar antes sus workers). Llamar al cerrar: destruir un hilo en marcha aborta
+    el proceso. quit() directo porque el quit encolado por `finished` necesita el
+    bucle de eventos de la GUI, que está bloqueado en wait().
+    """
+    for thread in parent.findChildren(QThread):
+        if isValid(thread):
+            thread.quit()
+            thread.wait()
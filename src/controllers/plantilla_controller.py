@@ -1,6 +1,9 @@
 # controllers/plantilla_controller.py
 from __future__ import annotations
-import math
+from typing import List
+
+import cv2
+import numpy as np
 
 from PySide6.QtCore import QPointF, Qt
 from PySide6.QtWidgets import QGraphicsScene, QGraphicsItem
@@ -11,57 +14,120 @@ from controllers.contour_controller import ContourController
 from controllers.image_controller import ImageController
 from controllers.scan_table_controller import ScanTableController
 from views.scene_items.plantilla_item import PlantillaItem
-from views.scene_items.image_item import ImageItem
+from views.scene_items.image_item import CloneItem, ImageItem
 from views.scene_items.contour_item import ContourItem
 
 
+# Desde esta cantidad de plantillas se busca con un árbol KD (cv2.flann); con menos,
+# la matriz de distancias completa es más rápida que construir y consultar el índice
+_KDTREE_MIN_TEMPLATES = 32
+
+
+class _Template:
+    """Plantilla activa: su PlantillaItem, desfases respecto de su contorno y firma de forma."""
+
+    def __init__(self, item: PlantillaItem, angle_off_set: float, pos_off_set: QPointF,
+                 signature: np.ndarray) -> None:
+        self.item = item
+        self.angle_off_set = angle_off_set
+        self.pos_off_set = pos_off_set
+        self.signature = signature
+
+
+class _SignatureIndex:
+    """Índice de firmas de plantillas: devuelve la más parecida a cada firma consultada."""
+
+    def __init__(self, signatures: np.ndarray) -> None:
+        self._sigs = np.ascontiguousarray(signatures, dtype=np.float32)
+        self._tree = None
+        if len(self._sigs) >= _KDTREE_MIN_TEMPLATES:
+            self._tree = cv2.flann_Index(self._sigs, dict(algorithm=1, trees=4))  # KD-tree
+
+    def nearest(self, queries: np.ndarray) -> np.ndarray:
+        q = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self._sigs.shape[1])
+        if len(self._sigs) == 1 or len(q) == 0:
+            return np.zeros(len(q), dtype=int)
+        if self._tree is not None:
+            idx, _ = self._tree.knnSearch(q, 1, params=dict(checks=64))
+            return idx.ravel().astype(int)
+        d = ((q[:, None, :] - self._sigs[None, :, :]) ** 2).sum(axis=2)
+        return d.argmin(axis=1)
+
+
 class PlantillaController:
-    """Controlador mínimo: crea PlantillaItem y lo centra sobre el contorno."""
+    """
+    Crea PlantillaItem (imagen + contorno) y los clona sobre los contornos detectados.
+    Puede haber varias plantillas activas: cada contorno recibe la plantilla cuya firma
+    de forma (área, proporción, momentos de Hu) está más cerca de la suya.
+    """
 
     def __init__(self, scene: QGraphicsScene, contour_ctrl: ContourController, image_ctrl: ImageController) -> None:
         self._scene = scene
         self.contour_ctrl = contour_ctrl
         self.image_ctrl = image_ctrl
-        self.angle_off_set = None
-        self.pos_off_set = None
-        self.plantilla: PlantillaItem | None = None
+        self.templates: List[_Template] = []
+        self._index: _SignatureIndex | None = None
+        self._index_key: tuple = ()
+
+    @property
+    def plantilla(self) -> PlantillaItem | None:
+        """Última plantilla creada."""
+        return self.templates[-1].item if self.templates else None
 
     def create(self, image_item: ImageItem, contour_item: ContourItem) -> PlantillaItem:
-        self.plantilla = PlantillaItem(image_item=image_item, contour_item=contour_item)
-        self.plantilla.controller = self
-        self._scene.addItem(self.plantilla)
+        plantilla = PlantillaItem(image_item=image_item, contour_item=contour_item)
+        plantilla.controller = self
+        self._scene.addItem(plantilla)
 
-        self.angle_off_set = 360 - contour_item.model.angle_o + image_item.rotation()
+        angle_off_set = 360 - contour_item.model.angle_o + image_item.rotation()
 
         rect_center = image_item.boundingRect().center()
         scene_center = image_item.mapToScene(rect_center)
 
         ctn_pos = QPointF(contour_item.model.cx_o,contour_item.model.cy_o)
 
-        self.pos_off_set = scene_center - ctn_pos
-        
-        return self.plantilla
+        pos_off_set = scene_center - ctn_pos
+
+        self.templates.append(_Template(plantilla, angle_off_set, pos_off_set, contour_item.model.signature))
+        self._index = None
+        return plantilla
 
     def apply_template(self):
         if self._scene is None:
             return
 
-        if self.plantilla is None:
+        templates = [t for t in self.templates if t.item.image_item is not None and t.item.image_item.image_levels()]
+        if not templates:
             return
 
-        template_image = self.plantilla.image_item
-        template_contour = self.plantilla.contour_item
-
-        if template_image is None:
+        own = {id(t.item.contour_item) for t in self.templates}
+        contours = [c for c in self.contour_ctrl._items if id(c) not in own]
+        if not contours:
             return
 
-        pixmap = template_image.pixmap()
-        if pixmap.isNull():
+        # Una sola consulta al índice para todos los contornos
+        key = tuple(id(t) for t in templates)
+        if self._index is None or key != self._index_key:
+            self._index = _SignatureIndex(np.stack([t.signature for t in templates]))
+            self._index_key = key
+        assigned = self._index.nearest(np.stack([c.model.signature for c in contours]))
+
+        for k, template in enumerate(templates):
+            self._place(template, [c for c, a in zip(contours, assigned) if a == k])
+
+    def _place(self, template: _Template, contours: List[ContourItem]) -> None:
+        """
+        Clona la imagen de `template` sobre cada contorno de `contours`. Ángulos y
+        posiciones salen de una sola pasada NumPy y los items ya armados se agregan
+        juntos al final (QGraphicsScene difiere solo la inserción en su índice BSP:
+        cambiar a NoIndex y volver obligaría a reconstruirlo entero).
+        """
+        if not contours:
             return
+        template_image = template.item.image_item
+        levels = template_image.image_levels()
+        size = template_image.image_size()
 
-        if self.angle_off_set is None or self.pos_off_set is None:
-            return
-        
         sx = self.image_ctrl._model.scale_sx
         sy = self.image_ctrl._model.scale_sy
 
@@ -69,50 +135,38 @@ class PlantillaController:
         flags = template_image.flags()
         z_value = template_image.zValue()
 
-        for contour in self.contour_ctrl._items:
-            if contour is template_contour:
-                continue
-
-            new_image = ImageItem()
-            new_image.set_image_pixmap(pixmap)
+        # Todos los clones comparten tamaño y flags: un solo boundingRect de referencia
+        probe = CloneItem(levels, size)
+        probe.setFlags(flags)
+        br = probe.boundingRect()
+        origin = br.center()
+        half_w, half_h = br.width() * sx / 2, br.height() * sy / 2
+
+        models = [c.model for c in contours]
+        angles = np.array([m.angle_o for m in models], dtype=np.float64) + template.angle_off_set
+        centers = np.array([(m.cx_o, m.cy_o) for m in models], dtype=np.float64)
+        a = np.radians(angles)
+        cos_a, sin_a = np.cos(a), np.sin(a)
+        off_x, off_y = template.pos_off_set.x(), template.pos_off_set.y()
+        xs = centers[:, 0] - half_w + off_x * cos_a - off_y * sin_a
+        ys = centers[:, 1] - half_h + off_x * sin_a + off_y * cos_a
+
+        clone_flags = flags | QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemIsMovable
+        clones: List[ImageItem] = []
+        for angle, x, y in zip(angles.tolist(), xs.tolist(), ys.tolist()):
+            new_image = CloneItem(levels, size)
             new_image.setTransform(base_transform, False)
-            new_image.setTransformOriginPoint(new_image.boundingRect().center())
-            new_image.setFlags(flags)
+            new_image.setTransformOriginPoint(origin)
+            new_image.setFlags(clone_flags)
             new_image.setZValue(z_value)
-
-            angle = contour.model.angle_o + self.angle_off_set
             new_image.setRotation(angle)
-            
-            ctn_cen = QPointF(contour.model.cx_o,contour.model.cy_o)
-            
-            br = new_image.boundingRect()
-            w = br.width() * sx
-            h = br.height() * sy
-
-            center_offset = QPointF(w / 2, h / 2)
-
-            rot_off_set = self.rotar_vector(self.pos_off_set, angle)
-            new_pos = ctn_cen - center_offset + rot_off_set
-            
-            if isinstance(new_pos, QPointF):
-                new_image.setPos(new_pos)
-            else:
-                new_image.setPos(QPointF(new_pos))
-
-            new_image.setFlag(QGraphicsItem.ItemIsSelectable, True)
-            new_image.setFlag(QGraphicsItem.ItemIsMovable, True)
+            new_image.setPos(x, y)
+            clones.append(new_image)
 
+        for new_image in clones:
             self._scene.addItem(new_image)
-            self.image_ctrl._images.append(new_image)
-
+        self.image_ctrl._images.extend(clones)
 
-    def rotar_vector(self, v: QPointF, angulo_deg: float) -> QPointF:
-        a = math.radians(angulo_deg)
-        cos_a, sin_a = math.cos(a), math.sin(a)
-        x = v.x() * cos_a - v.y() * sin_a
-        y = v.x() * sin_a + v.y() * cos_a
-        return QPointF(x, y)
-    
     def delete_item(self, plantilla_item):
         # Desintegrar: conservar hijos, quitar contenedor
         sc = getattr(self, "_scene", None)
@@ -142,21 +196,16 @@ class PlantillaController:
         if plantilla_item.scene() is sc:
             sc.removeItem(plantilla_item)
 
-        # Limpiar referencia interna si aplica
-        if getattr(self, "plantilla", None) is plantilla_item:
-            self.plantilla = None
-
-        self.angle_off_set = None
-        self.pos_off_set = None
+        # Quitar la plantilla de las activas
+        self.templates = [t for t in self.templates if t.item is not plantilla_item]
+        self._index = None
     
     def clear(self) -> None:
-        if self.plantilla is not None and self.plantilla.scene() is not None:
-            self._scene.removeItem(self.plantilla)
-        self.plantilla = None
-
-        # resetear offsets
-        self.angle_off_set = None
-        self.pos_off_set = None
+        for template in self.templates:
+            if template.item.scene() is not None:
+                self._scene.removeItem(template.item)
+        self.templates = []
+        self._index = None
 
     def _on_scan_table_changed(self, scan_ctrl: ScanTableController) -> None:
         """Se llama cuando cambia el background/scan table: limpia todo para evitar desalineaciones."""
@@ -6,6 +6,7 @@ from pathlib import Path
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import QGraphicsScene
 from PySide6.QtCore import QObject, Signal
+from controllers.load_worker import LoadWorker, start_in_thread, stop_threads
 from models.scan_table_model import ScanTableModel
 from utils.workspace_config import load_workspace, save_workspace
 from views.scene_items import ScanTableItem
@@ -14,12 +15,16 @@ from views.scene_items import ScanTableItem
 class ScanTableController(QObject):
     """High level controller coordinating the scan table background."""
     state_changed = Signal()
+    load_finished = Signal(bool)   # solo para la carga en segundo plano vigente
 
     def __init__(self, parent: QObject | None = None) -> None:
         super().__init__(parent)
         self._model = ScanTableModel()
         self._scene: QGraphicsScene | None = None
         self._item = ScanTableItem()
+        # Carga en segundo plano en curso y contador para descartar resultados viejos
+        self._loading: LoadWorker | None = None
+        self._load_token = 0
         # Sync the scene item with any pre-loaded background.
         pixmap = self._model.background_pixmap
         if pixmap is not None and not pixmap.isNull():
@@ -44,9 +49,54 @@ class ScanTableController(QObject):
 
     def load_background(self, path: Path) -> bool:
         """Load a background image and update the scene item."""
-        
-        if not self._model.load_background(path):
+        return self._apply_background(self._model.prepare_background(path))
+
+    def load_background_async(self, path: Path) -> LoadWorker:
+        """
+        Decodifica el fondo en un QThread y lo aplica al terminar (state_changed y
+        load_finished se emiten solo entonces). Abrir otro archivo mientras tanto
+        cancela esta carga y descarta su resultado.
+        """
+        self.cancel_load()
+        self._load_token += 1
+        path = Path(path)
+        worker = LoadWorker(self._load_token, lambda progress: self._prepare(path, progress))
+        worker.finished.connect(self._on_background_loaded)
+        self._loading = worker
+        start_in_thread(self, worker)
+        return worker
+
+    def is_loading(self) -> bool:
+        return self._loading is not None
+
+    def cancel_load(self) -> None:
+        """Aborta la carga en curso; su resultado se descarta y el modelo no cambia."""
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+            self._load_token += 1
+
+    def shutdown(self) -> None:
+        """Cancela la carga en curso y espera sus hilos (al cerrar la ventana)."""
+        self.cancel_load()
+        stop_threads(self)
+
+    def _prepare(self, path: Path, progress) -> dict | None:
+        progress(0, 1)
+        prepared = self._model.prepare_background(path)
+        progress(1, 1)
+        return prepared
+
+    def _on_background_loaded(self, token: int, prepared) -> None:
+        if token != self._load_token:
+            return  # carga reemplazada por otra más nueva
+        self._loading = None
+        self.load_finished.emit(self._apply_background(prepared))
+
+    def _apply_background(self, prepared: dict | None) -> bool:
+        if not self._model.apply_background(prepared):
             return False
+        path = self._model.background_path
         pixmap = self._model.background_pixmap
         if pixmap is None:
             return False
@@ -5,7 +5,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QIcon
+from PySide6.QtGui import QCloseEvent, QIcon
 from PySide6.QtWidgets import QFileDialog, QMainWindow, QMessageBox, QDialog
 
 from controllers.contour_controller import ContourController
@@ -55,6 +55,8 @@ class MainWindow(QMainWindow):
         self.ctrl_scan_table.state_changed.connect(
             lambda: self.ctrl_contours._on_scan_table_changed(self.ctrl_scan_table),
         )
+        # La detección termina en segundo plano: refrescar el conteo al llegar
+        self.ctrl_contours.contours_changed.connect(self._update_status)
         self.ctrl_scan_table.state_changed.connect(
             lambda: self.ctrl_image._on_scan_table_changed(self.ctrl_scan_table)
         )
@@ -72,7 +74,14 @@ class MainWindow(QMainWindow):
         self._update_actions_state()
         self._update_status()
 
-    
+    def closeEvent(self, event: QCloseEvent) -> None:
+        # Exportación, cargas y detección corren en QThreads hijos de los controladores:
+        # cancelarlos y esperarlos antes de que Qt los destruya con la ventana
+        self.ctrl_image.shutdown()
+        self.ctrl_scan_table.shutdown()
+        self.ctrl_contours.shutdown()
+        super().closeEvent(event)
+
     def _refresh_view(self) -> None:
         # Sincroniza el item con el modelo por si cambió el pixmap
         self.ctrl_scan_table.refresh()
@@ -100,7 +109,8 @@ class MainWindow(QMainWindow):
         has_output =  self.ctrl_image.has_output()
 
         self.toolbar.load_tif_action.setEnabled(has_bg)
-        self.toolbar.save_action.setEnabled(has_output)
+        # Guardar queda deshabilitado mientras hay una exportación en segundo plano
+        self.toolbar.save_action.setEnabled(has_output and not self.ctrl_image.is_exporting())
 
         if state_sel == 1:
             self.toolbar.create_template_action.setEnabled(True)
@@ -1,97 +1,250 @@
 from __future__ import annotations
 
-from typing import Any
+import sys
+from typing import Any, Dict, Iterable, List, Sequence
 import cv2
 import numpy as np
 from PySide6.QtGui import QPolygonF
-from PySide6.QtCore import QPointF
+from PySide6.QtCore import QByteArray, QDataStream, QIODevice
+
+# Momentos de Hu usados en la firma de forma y peso de cada componente de la firma.
+# Solo Hu1 y Hu2 (siempre >= 0): Hu3 y siguientes valen ~0 en formas simétricas respecto
+# del centro (rectángulos, óvalos) y en escala log son puro ruido, mayor que la
+# diferencia de área entre talles
+_SIGNATURE_HU = 2
+# Por debajo de esto un momento de Hu se toma como 0 (evita que el log amplifique ruido)
+_HU_FLOOR = 1e-4
+_SIGNATURE_WEIGHTS = np.array([1.0, 1.0] + [0.5] * _SIGNATURE_HU)
+SIGNATURE_SIZE = len(_SIGNATURE_WEIGHTS)
 
 
 class ContourModel:
-    """Datos básicos de un contorno detectado."""
+    """
+    Datos básicos de un contorno detectado.
+    La geometría canónica son arreglos NumPy float64 (`contour` (N,2) y `box` (4,2));
+    `scene_contour` / `scene_box` son QPolygonF que se crean recién al pedirlos.
+    """
 
     def __init__(
         self,
         original_contour: Any | None = None,
         scene_contour: QPolygonF | None = None,
         scene_box: QPolygonF | None = None,
+        calc: bool = True,
     ) -> None:
         self.original_contour = original_contour
-        self.scene_contour = QPolygonF(scene_contour) if scene_contour is not None else QPolygonF()
-        self.scene_box = QPolygonF(scene_box) if scene_box is not None else QPolygonF()
+        if scene_contour is not None:
+            self.contour = polygon_to_array(scene_contour)
+        elif original_contour is not None:
+            self.contour = np.asarray(original_contour, dtype=np.float64).reshape(-1, 2)
+        else:
+            self.contour = np.zeros((0, 2), dtype=np.float64)
+        self.box = polygon_to_array(scene_box) if scene_box is not None else np.zeros((0, 2), dtype=np.float64)
+        self._scene_contour: QPolygonF | None = None
+        self._scene_box: QPolygonF | None = None
         self.cx_o = None
         self.cy_o = None
         self.w_o = None
         self.h_o = None
         self.angle_o = None
         self.direccion = None
-        self.calc_data()
+        self.area = None
+        self.signature: np.ndarray | None = None   # ver shape_signatures
+        if calc:
+            self.calc_data()
+
+    @classmethod
+    def from_contours(cls, contours: Sequence[np.ndarray]) -> List["ContourModel"]:
+        """
+        Modelos para todos los contornos (N,1,2)/(N,2) de una vez: la geometría se
+        calcula en lote con contour_geometry y los rectángulos (lo único que se pinta)
+        se convierten a QPolygonF juntos al final.
+        """
+        geo = contour_geometry(contours)
+        models: List[ContourModel] = []
+        for i, c in enumerate(contours):
+            m = cls(original_contour=c, calc=False)
+            m._apply_geometry(geo, i)
+            models.append(m)
+        for m, poly in zip(models, polygons_from_arrays(geo["box"])):
+            m._scene_box = poly
+        return models
+
+    # --- Vistas Qt, creadas a demanda ---
+    @property
+    def scene_contour(self) -> QPolygonF:
+        if self._scene_contour is None:
+            self._scene_contour = polygons_from_arrays([self.contour])[0]
+        return self._scene_contour
+
+    @scene_contour.setter
+    def scene_contour(self, polygon: QPolygonF) -> None:
+        self.contour = polygon_to_array(polygon)
+        self._scene_contour = None
+
+    @property
+    def scene_box(self) -> QPolygonF:
+        if self._scene_box is None:
+            self._scene_box = polygons_from_arrays([self.box])[0]
+        return self._scene_box
+
+    @scene_box.setter
+    def scene_box(self, polygon: QPolygonF) -> None:
+        self.box = polygon_to_array(polygon)
+        self._scene_box = None
 
     def set_original_contour(self, contour: Any) -> None:
         self.original_contour = contour
 
     def set_scene_contour(self, polygon: QPolygonF) -> None:
-        self.scene_contour = QPolygonF(polygon)
+        self.scene_contour = polygon
 
     def set_scene_box(self, polygon: QPolygonF) -> None:
-        self.scene_box = QPolygonF(polygon)
-    
+        self.scene_box = polygon
+
     def calc_data(self) -> None:
-        points_list = [[point.x(), point.y()] for point in self.scene_contour]
-        points_np = np.array(points_list, dtype=np.float32)
-        rect = cv2.minAreaRect(points_np)
-        (self.cx_o, self.cy_o), (self.w_o, self.h_o), self.angle_o = rect
-        box_points = cv2.boxPoints(rect)
-        
-        # Calcular distancias
-        distancia01 = cv2.norm(box_points[1] - box_points[0])
-        distancia03 = cv2.norm(box_points[3] - box_points[0])
-        
-        # Determinar el lado largo y crear el polígono
-        if distancia01 < distancia03:
-            self.angle_o += 90
-        
-        
-        # Crear polígono una sola vez
-        poly = QPolygonF([QPointF(float(x), float(y)) for x, y in box_points])
-        self.scene_box = poly
-        
-        ang = np.deg2rad(-self.angle_o)
-        R = np.array([[np.cos(ang), -np.sin(ang)],
-                    [np.sin(ang),  np.cos(ang)]])
-        pts = np.asarray(points_np, dtype=float) - (self.cx_o, self.cy_o)
-        pts_rot = pts @ R.T + (self.cx_o, self.cy_o)
-
-        #poly = QPolygonF([QPointF(float(x), float(y)) for x, y in pts_rot])
-        #self.scene_box = poly
-
-        pts_rot = np.floor(pts_rot).astype(int)
-
-        peri = cv2.arcLength(pts_rot, True)
-        epsilon = 0.01 * peri
-        pts_rot = cv2.approxPolyDP(pts_rot, epsilon, True)
-        pts_rot = pts_rot.reshape(-1, 2)
-        #poly = QPolygonF([QPointF(float(x), float(y)) for x, y in pts_rot])
-        #self.scene_box = poly
-        y_min, y_max = np.min(pts_rot[:,1]), np.max(pts_rot[:,1])
-        y0 = (y_max + y_min)/2
-
-
-        x, y, w, h = cv2.boundingRect(pts_rot)
-        pts_shift = pts_rot - np.array([x, y])
-
-        mask = np.zeros((h, w), np.uint8)
-        cv2.fillPoly(mask, [pts_shift], 255)
-
-        # Índice de corte relativo a la máscara
-        idx = int(round(y0 - y))
-        idx = np.clip(idx, 0, h)  # limitar dentro de la máscara
-
-        arriba = np.count_nonzero(mask[:idx, :]) * 1.0
-        abajo = np.count_nonzero(mask[idx:, :]) * 1.0
-
-        if arriba > abajo:
-            self.direccion = "abajo"
-            self.angle_o += 180
-        else: 
-            self.direccion = "arriba"
\ No newline at end of file
+        self._apply_geometry(contour_geometry([self.contour]), 0)
+
+    def _apply_geometry(self, geo: Dict[str, np.ndarray], i: int) -> None:
+        self.cx_o = float(geo["cx"][i])
+        self.cy_o = float(geo["cy"][i])
+        self.w_o = float(geo["w"][i])
+        self.h_o = float(geo["h"][i])
+        self.angle_o = float(geo["angle"][i])
+        self.direccion = "abajo" if geo["abajo"][i] else "arriba"
+        self.area = float(geo["area"][i])
+        self.signature = geo["signature"][i]
+        self.box = geo["box"][i].astype(np.float64)
+        self._scene_box = None
+
+
+def contour_geometry(contours: Sequence[np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Geometría de varios contornos a la vez (solo NumPy, apto para cualquier hilo).
+    Devuelve arreglos de largo N: cx, cy, w, h (cv2.minAreaRect), angle (lado largo
+    horizontal y +180 si la prenda apunta hacia abajo), abajo (bool), area, box (N,4,2)
+    y signature (N,F, ver shape_signatures).
+
+    La dirección compara el área del contorno, ya rotado a su ángulo, por encima y por
+    debajo de la línea media de su alto. Las áreas salen de la fórmula de Green
+    (A = ∮ x dy) recortando cada arista en y0; sobre la línea de corte dy = 0, así
+    que no hace falta cerrar el polígono recortado ni rasterizar una máscara.
+    """
+    n = len(contours)
+    pts = [np.asarray(c, dtype=np.float32).reshape(-1, 2) for c in contours]
+    rects = [cv2.minAreaRect(p) for p in pts]
+    cx = np.array([r[0][0] for r in rects], dtype=np.float64).reshape(n)
+    cy = np.array([r[0][1] for r in rects], dtype=np.float64).reshape(n)
+    w = np.array([r[1][0] for r in rects], dtype=np.float64).reshape(n)
+    h = np.array([r[1][1] for r in rects], dtype=np.float64).reshape(n)
+    angle = np.array([r[2] for r in rects], dtype=np.float64).reshape(n)
+    box = _box_points(cx, cy, w, h, angle)
+    # Lado p0-p1 mide h y p0-p3 mide w: girar 90° si el lado largo es w
+    angle = angle + np.where(h < w, 90.0, 0.0)
+    if n == 0:
+        return {"cx": cx, "cy": cy, "w": w, "h": h, "angle": angle,
+                "abajo": np.zeros(0, dtype=bool), "area": np.zeros(0), "box": box,
+                "signature": np.zeros((0, SIGNATURE_SIZE))}
+
+    # Todos los puntos en un solo arreglo; `starts` marca el inicio de cada contorno
+    counts = np.array([len(p) for p in pts])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    xy = np.concatenate(pts).astype(np.float64)
+    ang = np.deg2rad(-np.repeat(angle, counts))
+    ccx, ccy = np.repeat(cx, counts), np.repeat(cy, counts)
+    dx, dy = xy[:, 0] - ccx, xy[:, 1] - ccy
+    x = np.cos(ang) * dx - np.sin(ang) * dy + ccx
+    y = np.sin(ang) * dx + np.cos(ang) * dy + ccy
+
+    y_min = np.minimum.reduceat(y, starts)
+    y_max = np.maximum.reduceat(y, starts)
+    y0 = np.repeat((y_min + y_max) / 2.0, counts)
+
+    # Arista i -> i+1, cerrando cada contorno sobre su primer punto
+    nxt = np.arange(1, len(xy) + 1)
+    nxt[np.cumsum(counts) - 1] = starts
+    x1, y1, x2, y2 = x, y, x[nxt], y[nxt]
+    total = np.add.reduceat((y2 - y1) * (x1 + x2) * 0.5, starts)
+
+    # Misma integral con las aristas recortadas a y <= y0 (la parte de arriba)
+    ya, yb = np.minimum(y1, y0), np.minimum(y2, y0)
+    dy_edge = y2 - y1
+    flat = dy_edge == 0
+    slope = np.where(flat, 0.0, (x2 - x1) / np.where(flat, 1.0, dy_edge))
+    xa, xb = x1 + slope * (ya - y1), x1 + slope * (yb - y1)
+    upper = np.add.reduceat((yb - ya) * (xa + xb) * 0.5, starts)
+
+    # Ambas integrales comparten orientación: el valor absoluto da cada área
+    abajo = np.abs(upper) > np.abs(total - upper)
+    angle = angle + np.where(abajo, 180.0, 0.0)
+    area = np.abs(total)
+    hu = np.array([cv2.HuMoments(cv2.moments(p)).ravel() for p in pts], dtype=np.float64)
+    return {"cx": cx, "cy": cy, "w": w, "h": h, "angle": angle, "abajo": abajo,
+            "area": area, "box": box, "signature": shape_signatures(area, w, h, hu)}
+
+
+def shape_signatures(area: np.ndarray, w: np.ndarray, h: np.ndarray, hu: np.ndarray) -> np.ndarray:
+    """
+    Firma (N, SIGNATURE_SIZE) para comparar formas por distancia euclídea:
+    log del área, log de la proporción lado largo / lado corto y Hu1, Hu2 en escala
+    log (acotados en _HU_FLOOR). Todo es invariante a la rotación; el área no lo es
+    a la escala, a propósito: distingue talles.
+    """
+    long_side, short_side = np.maximum(w, h), np.minimum(w, h)
+    aspect = long_side / np.maximum(short_side, 1e-9)
+    hu = hu[:, :_SIGNATURE_HU]
+    log_hu = -np.log10(np.maximum(np.abs(hu), _HU_FLOOR))
+    feats = np.column_stack([np.log(np.maximum(area, 1.0)), np.log(aspect), log_hu])
+    return feats * _SIGNATURE_WEIGHTS
+
+
+def _box_points(cx, cy, w, h, angle) -> np.ndarray:
+    """Vértices (N,4,2) float32 en el mismo orden que cv2.boxPoints."""
+    t = np.deg2rad(angle)
+    b, a = np.cos(t) * 0.5, np.sin(t) * 0.5
+    p0 = np.stack([cx - a * h - b * w, cy + b * h - a * w], axis=-1)
+    p1 = np.stack([cx + a * h - b * w, cy - b * h - a * w], axis=-1)
+    c = np.stack([cx, cy], axis=-1)
+    return np.stack([p0, p1, 2 * c - p0, 2 * c - p1], axis=1).astype(np.float32)
+
+
+# --- Conversión NumPy <-> QPolygonF ---
+# QPolygonF se serializa en QDataStream como un quint32 con la cantidad de puntos
+# seguido de pares de doubles: armar ese flujo desde arreglos contiguos evita crear un
+# QPointF por punto desde Python.
+
+_STREAM_ORDER = (
+    QDataStream.ByteOrder.LittleEndian if sys.byteorder == "little"
+    else QDataStream.ByteOrder.BigEndian
+)
+
+
+def polygons_from_arrays(arrays: Iterable[np.ndarray]) -> List[QPolygonF]:
+    """QPolygonF de varios arreglos (N,2) / (N,1,2), leídos de un solo buffer."""
+    arrays = [np.ascontiguousarray(np.asarray(a, dtype=np.float64).reshape(-1, 2)) for a in arrays]
+    sizes = [4 + a.nbytes for a in arrays]
+    buf = np.empty(sum(sizes), dtype=np.uint8)
+    pos = 0
+    for a, size in zip(arrays, sizes):
+        buf[pos:pos + 4] = np.frombuffer(np.uint32(len(a)).tobytes(), dtype=np.uint8)
+        buf[pos + 4:pos + size] = a.view(np.uint8).ravel()
+        pos += size
+
+    data = QByteArray(buf.tobytes())  # el stream no lo retiene: mantener la referencia
+    stream = QDataStream(data, QIODevice.OpenModeFlag.ReadOnly)
+    stream.setByteOrder(_STREAM_ORDER)
+    polygons: List[QPolygonF] = []
+    for _ in arrays:
+        poly = QPolygonF()
+        stream >> poly
+        polygons.append(poly)
+    return polygons
+
+
+def polygon_to_array(polygon: QPolygonF) -> np.ndarray:
+    """Puntos (N,2) float64 de `polygon`, sin recorrerlo punto a punto."""
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream.setByteOrder(_STREAM_ORDER)
+    stream << QPolygonF(polygon)
+    return np.frombuffer(data.data(), dtype=np.float64, offset=4).reshape(-1, 2).copy()
@@ -3,25 +3,39 @@
 
 from __future__ import annotations
 
+from functools import partial
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Callable, Optional, Tuple, List, Union
 
+import cv2
 import numpy as np
 from PySide6.QtGui import QImage
 
-from utils.file_manager import load_tif, to_rgba8_preview
+from utils.compositor import ProgressCallback
+from utils.file_manager import load_tif, probe_tif, to_rgba8_preview
+from utils.preview_cache import PreviewCache
+
+# Lado mayor del nivel más fino de la previsualización (el maestro solo se usa al exportar)
+PREVIEW_MAX_SIDE = 2048
+# Se deja de reducir a la mitad por debajo de este lado mayor
+PREVIEW_MIN_SIDE = 128
 
 
 class ImageModel:
-    """Lightweight model keeping a master pixel buffer and a QImage preview."""
+    """Lightweight model keeping a master pixel buffer and a QImage preview pyramid."""
 
     def __init__(self) -> None:
-        # Ruta y previsualización
+        # Ruta y previsualización (pirámide RGBA8, del nivel más fino al más grueso)
         self._image_path: Optional[Path] = None
-        self._qimage: Optional[QImage] = None
+        self._levels: List[QImage] = []
+        self.preview_max_side: int = PREVIEW_MAX_SIDE
+        # Pirámides y metadatos ya convertidos en disco (None = siempre decodificar)
+        self.preview_cache: Optional[PreviewCache] = None
 
         # Buffer maestro y metadatos físicos / de color
-        self.pixels: Optional[np.ndarray] = None          # HxWxC, dtype intacto
+        self._pixels: Optional[np.ndarray] = None         # HxWxC, dtype intacto
+        self._pixels_loader: Optional[Callable[[], Optional[np.ndarray]]] = None
+        self._shape: Optional[Tuple[int, ...]] = None
         self.dpi_x: Optional[float] = None
         self.dpi_y: Optional[float] = None
         self.width_mm: Optional[float] = None
@@ -39,26 +53,136 @@ class ImageModel:
     def image_path(self) -> Optional[Path]:
         return self._image_path
 
+    @property
+    def pixels(self) -> Optional[np.ndarray]:
+        """
+        Buffer maestro; si la previsualización vino de la caché, se lee del TIF al primer
+        uso (en el hilo que lo pida: fuera de la GUI conviene usar pixels_source).
+        """
+        if self._pixels is None and self._pixels_loader is not None:
+            loader, self._pixels_loader = self._pixels_loader, None
+            self._pixels = loader()
+        return self._pixels
+
+    @pixels.setter
+    def pixels(self, value: Optional[np.ndarray]) -> None:
+        self._pixels = value
+        self._pixels_loader = None
+        self._shape = None
+
+    def pixels_source(self) -> Union[np.ndarray, Callable[[], np.ndarray], None]:
+        """
+        Buffer maestro si ya está en memoria; si no, la función que lo lee del TIF (lanza
+        ValueError/OSError si el archivo cambió o desapareció desde que se abrió) para
+        llamarla en otro hilo. Lo leído se devuelve al modelo con adopt_pixels.
+        """
+        if self._pixels is not None:
+            return self._pixels
+        return self._pixels_loader
+
+    def adopt_pixels(self, loader: Callable[[], np.ndarray], pixels: np.ndarray) -> None:
+        """Guarda el buffer que `loader` (de pixels_source) leyó fuera del modelo, si sigue vigente."""
+        if self._pixels is None and self._pixels_loader is loader:
+            self._pixels = pixels
+            self._pixels_loader = None
+
+    @property
+    def pixel_shape(self) -> Optional[Tuple[int, ...]]:
+        """Forma (H, W[, C]) del buffer maestro, sin leerlo si aún no se cargó."""
+        shape = self._shape if self._shape is not None else getattr(self._pixels, "shape", None)
+        return tuple(int(n) for n in shape) if shape is not None else None
+
     @property
     def qimage(self) -> Optional[QImage]:
-        return self._qimage
+        """Nivel más fino de la previsualización (no tiene por qué medir lo que el maestro)."""
+        return self._levels[0] if self._levels else None
+
+    @property
+    def preview_levels(self) -> List[QImage]:
+        return list(self._levels)
+
+    @property
+    def pixel_size(self) -> Optional[Tuple[int, int]]:
+        """(ancho, alto) del buffer maestro en píxeles (sin leerlo si aún no se cargó)."""
+        shape = self.pixel_shape
+        if shape is None:
+            return None
+        return int(shape[1]), int(shape[0])
 
     def has_image(self) -> bool:
-        return self._qimage is not None and not self._qimage.isNull()
+        return bool(self._levels) and not self._levels[0].isNull()
 
     def load_image(self, path: Path) -> bool:
         """
         Carga un TIF con file_manager.load_tif (mantiene dtype original en `self.pixels`)
-        y crea una previsualización RGBA8 mediante utils.file_manager.to_rgba8_preview.
+        y crea una pirámide de previsualizaciones RGBA8: el maestro se reduce primero a
+        `preview_max_side` y solo esa reducción pasa por utils.file_manager.to_rgba8_preview.
+        Con `preview_cache`, si el archivo ya se abrió antes, pirámide y metadatos salen de
+        la caché y los píxeles solo se leen cuando algo (la exportación) los pide.
+        """
+        return self.apply_image(self.prepare_image(path))
+
+    def prepare_image(self, path: Path, progress: ProgressCallback | None = None) -> Optional[dict]:
         """
+        Parte pesada de load_image (lectura, previsualización, caché) sin tocar el estado
+        del modelo: se puede llamar desde otro hilo y aplicar después con apply_image.
+        """
+        def step(done: int) -> None:
+            if progress is not None:
+                progress(done, 3)
+
+        path = Path(path)
+        cache = self.preview_cache
+        max_side = self.preview_max_side
+        step(0)
+        # Tamaño y fecha con los que se validó la caché: los píxeles se leen más tarde y
+        # solo si el archivo sigue siendo el mismo
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        cached = cache.get(path, max_side) if cache is not None else None
+        if cached is not None and probe_tif(path) is not None:
+            meta, rgba_levels = cached
+            step(2)
+            levels = [_to_qimage(lv) for lv in rgba_levels]
+            step(3)
+            return {"path": path, "meta": meta, "pixels": None, "levels": levels,
+                    "stat": (st.st_size, st.st_mtime_ns)}
+
         data = load_tif(path)
         if not data or data.get("pixels") is None:
+            return None
+        step(1)
+
+        # Pirámide RGBA8 (conserva transparencia si existe)
+        rgba_levels = _build_levels(
+            data["pixels"], data["photometric"], data["cmyk_order"], data["alpha_index"], max_side,
+        )
+        step(2)
+        if cache is not None and rgba_levels:
+            cache.put(path, data, rgba_levels, max_side)
+        levels = [_to_qimage(lv) for lv in rgba_levels]
+        step(3)
+        return {"path": path, "meta": data, "pixels": data["pixels"], "levels": levels}
+
+    def apply_image(self, prepared: Optional[dict]) -> bool:
+        """Aplica el resultado de prepare_image (None = fallo: el modelo queda vacío)."""
+        if prepared is None:
             self.clear()
             return False
+        path = prepared["path"]
+        # Ruta y metadatos (buffer maestro intacto); sin buffer, se lee al primer uso
+        self.pixels = prepared["pixels"]
+        if prepared["pixels"] is None:
+            self._pixels_loader = partial(_load_pixels, path, prepared["stat"])
+        self._set_metadata(path, prepared["meta"])
+        self._levels = list(prepared["levels"])
+        return True
 
-        # 1) Ruta y metadatos (buffer maestro intacto)
-        self._image_path = Path(path)
-        self.pixels = data["pixels"]
+    def _set_metadata(self, path: Path, data: dict) -> None:
+        self._image_path = path
+        self._shape = tuple(data["shape"])
         self.dpi_x = data["dpi_x"]
         self.dpi_y = data["dpi_y"]
         self.width_mm = data["width_mm"]
@@ -69,19 +193,9 @@ class ImageModel:
         self.icc_profile = data["icc_profile"]
         self.ink_names = data["ink_names"]
 
-        # 2) Preview RGBA8 (conserva transparencia si existe)
-        rgba8 = to_rgba8_preview(self.pixels, self.photometric, self.cmyk_order, self.alpha_index)
-        if rgba8 is not None and rgba8.ndim == 3 and rgba8.shape[2] == 4:
-            h, w = rgba8.shape[:2]
-            self._qimage = QImage(rgba8.data, w, h, rgba8.strides[0], QImage.Format_RGBA8888).copy()
-        else:
-            self._qimage = None
-
-        return True
-
     def clear(self) -> None:
         self._image_path = None
-        self._qimage = None
+        self._levels = []
         self.pixels = None
         self.dpi_x = None
         self.dpi_y = None
@@ -92,3 +206,68 @@ class ImageModel:
         self.alpha_index = None
         self.icc_profile = None
         self.ink_names = None
+
+
+def _build_levels(
+    pixels: np.ndarray,
+    photometric: Optional[str],
+    cmyk_order: Optional[Tuple[int, int, int, int]],
+    alpha_index: Optional[int],
+    max_side: int,
+) -> List[np.ndarray]:
+    """Pirámide RGBA8 (del nivel más fino al más grueso) a partir del maestro."""
+    small = _downsample(pixels, max_side)
+    rgba8 = to_rgba8_preview(small, photometric, cmyk_order, alpha_index)
+    if rgba8 is None or rgba8.ndim != 3 or rgba8.shape[2] != 4:
+        return []
+
+    levels = [rgba8]
+    while max(rgba8.shape[:2]) > PREVIEW_MIN_SIDE:
+        h, w = rgba8.shape[:2]
+        rgba8 = cv2.resize(rgba8, (max(1, w // 2), max(1, h // 2)), interpolation=cv2.INTER_AREA)
+        levels.append(rgba8)
+    return levels
+
+
+def _downsample(pixels: np.ndarray, max_side: int) -> np.ndarray:
+    """Reduce por área (cualquier dtype y número de canales) hasta que el lado mayor quepa en `max_side`."""
+    h, w = pixels.shape[:2]
+    f = max(h, w) / float(max_side)
+    if f <= 1.0:
+        return pixels
+    size = (max(1, round(w / f)), max(1, round(h / f)))
+    try:
+        if pixels.ndim == 3 and pixels.shape[2] > 4:
+            # cv2.resize reduce por área fraccionaria solo hasta 4 canales: por grupos
+            out = np.empty((size[1], size[0], pixels.shape[2]), dtype=pixels.dtype)
+            for c in range(0, pixels.shape[2], 4):
+                part = cv2.resize(pixels[..., c:c + 4], size, interpolation=cv2.INTER_AREA)
+                out[..., c:c + 4] = part.reshape(size[1], size[0], -1)
+            return out
+        out = cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+    except cv2.error:
+        # dtype sin soporte en cv2 (p.ej. int32): diezmado simple
+        k = int(np.ceil(f))
+        return pixels[::k, ::k]
+    if out.ndim == 2 and pixels.ndim == 3:
+        out = out[..., np.newaxis]
+    return out
+
+
+def _load_pixels(path: Path, stat: Tuple[int, int]) -> np.ndarray:
+    """Lee el maestro de `path` si su (tamaño, mtime_ns) sigue siendo `stat`."""
+    try:
+        st = path.stat()
+    except OSError:
+        raise FileNotFoundError(f"{path.name} ya no existe; vuelva a cargar la imagen") from None
+    if (st.st_size, st.st_mtime_ns) != tuple(stat):
+        raise ValueError(f"{path.name} cambió desde que se abrió; vuelva a cargar la imagen")
+    data = load_tif(path)
+    if not data or data.get("pixels") is None:
+        raise ValueError(f"No se pudo leer {path.name}")
+    return data["pixels"]
+
+
+def _to_qimage(rgba8: np.ndarray) -> QImage:
+    h, w = rgba8.shape[:2]
+    return QImage(rgba8.data, w, h, rgba8.strides[0], QImage.Format_RGBA8888).copy()
@@ -6,7 +6,7 @@ from pathlib import Path
 from typing import Optional
 
 import numpy as np
-from PySide6.QtGui import QPixmap
+from PySide6.QtGui import QImage, QPixmap
 
 from utils.file_manager import load_scan_table
 from utils.workspace_config import load_workspace
@@ -47,14 +47,33 @@ class ScanTableModel:
 
     # --- Carga/Limpieza ---
     def load_background(self, path: Path) -> bool:
+        return self.apply_background(self.prepare_background(path))
+
+    def prepare_background(self, path: Path) -> Optional[dict]:
+        """
+        Decodifica la imagen una sola vez sin tocar el modelo (apto para otro hilo);
+        el QImage envuelve el mismo buffer de NumPy, sin copiarlo.
+        """
         image = load_scan_table(path)
         if image is None:
+            return None
+        return {"path": Path(path), "image": image, "qimage": _wrap_qimage(image)}
+
+    def apply_background(self, prepared: Optional[dict]) -> bool:
+        """Aplica el resultado de prepare_background en el hilo de la GUI (crea el QPixmap)."""
+        if prepared is None:
             self.clear_background()
             return False
 
-        self.scan_table_path = Path(path)
-        self.scan_table_image = image
-        self.scan_table_pixmap = QPixmap(str(self.scan_table_path))
+        self.scan_table_path = prepared["path"]
+        self.scan_table_image = prepared["image"]
+        qimage = prepared["qimage"]
+        if qimage is None:
+            # Formato sin equivalente en QImage: que Qt lo decodifique
+            self.scan_table_pixmap = QPixmap(str(self.scan_table_path))
+        else:
+            # `image` sigue vivo mientras se convierte: el QImage no es dueño del buffer
+            self.scan_table_pixmap = QPixmap.fromImage(qimage)
         if self.scan_table_pixmap.isNull():
             self.scan_table_pixmap = None
 
@@ -79,3 +98,21 @@ class ScanTableModel:
         h, w = img.shape[:2]
         self.mm_per_pixel_x = self.workspace_width_mm / float(w)
         self.mm_per_pixel_y = self.workspace_height_mm / float(h)
+
+
+# Formato de QImage para un buffer uint8 (H, W, C) según C (4 = BGRA de cv2)
+_QIMAGE_FORMATS = {
+    1: QImage.Format_Grayscale8,
+    3: QImage.Format_RGB888,
+    4: QImage.Format_ARGB32,
+}
+
+
+def _wrap_qimage(image: np.ndarray) -> Optional[QImage]:
+    """QImage que comparte el buffer de `image` (sin copia), o None si no hay formato equivalente."""
+    channels = image.shape[2] if image.ndim == 3 else 1
+    fmt = _QIMAGE_FORMATS.get(channels)
+    if image.dtype != np.uint8 or fmt is None or not image.flags.c_contiguous:
+        return None
+    h, w = image.shape[:2]
+    return QImage(image.data, w, h, image.strides[0], fmt)
@@ -0,0 +1,661 @@
+"""Compositing of the workspace canvas (full or band-wise) used by the TIFF export."""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Presupuesto por banda al exportar en streaming (bytes de canvas en memoria).
+DEFAULT_BAND_BYTES = 64 * 1024 * 1024
+# Filas por bloque de mapas de remapeo (acota la memoria temporal por item).
+_MAP_ROWS = 256
+# Interpolación usada al rasterizar las copias.
+INTERPOLATION = cv2.INTER_LINEAR
+# Mosaico (alto, ancho) en que se reparte el canvas entre hilos.
+DEFAULT_TILE = (1024, 1024)
+
+# progress(hechos, total); puede lanzar una excepción para cancelar la composición.
+ProgressCallback = Callable[[int, int], None]
+
+
+class Placement(NamedTuple):
+    """Colocación de una copia de la imagen base en el canvas (píxeles).
+
+    - inverse: afín 2x3 marco -> imagen base (rotación, escala física y traslación),
+      donde marco = canvas - shift.
+    - x0, y0, width, height: huella de la copia en el canvas (sin recortar).
+    - shared_angle: ángulo cuantizado si la copia puede reutilizar un parche rotado
+      (traslación entera); None si se rasteriza exacta.
+    - shift: desplazamiento entero del marco; las copias cuantizadas se evalúan en el
+      marco canónico (centro en 0, 0), así su parche no depende de la posición.
+    - quarter: q si la copia es la imagen base girada q*90° en sentido horario y
+      alineada a píxel entero (se copia sin interpolar); None en otro caso.
+    """
+
+    inverse: np.ndarray
+    x0: int
+    y0: int
+    width: int
+    height: int
+    shared_angle: Optional[float] = None
+    shift: Tuple[int, int] = (0, 0)
+    quarter: Optional[int] = None
+
+    @property
+    def x1(self) -> int:
+        return self.x0 + self.width
+
+    @property
+    def y1(self) -> int:
+        return self.y0 + self.height
+
+
+def canvas_shape(
+    width_mm: float,
+    height_mm: float,
+    dpi_x: float,
+    dpi_y: float,
+    src_shape: Sequence[int],
+) -> Tuple[int, ...]:
+    """Forma del canvas (mm -> px) con los canales de una imagen base de forma `src_shape`."""
+    width_px = int(round(width_mm * float(dpi_x) / 25.4))
+    height_px = int(round(height_mm * float(dpi_y) / 25.4))
+    if width_px <= 0 or height_px <= 0:
+        raise ValueError(f"Tamaño de canvas inválido: {width_px}x{height_px}")
+    if len(src_shape) == 3:
+        return (height_px, width_px, int(src_shape[2]))
+    if len(src_shape) == 2:
+        return (height_px, width_px)
+    raise ValueError(f"Forma de imagen no soportada: {tuple(src_shape)}")
+
+
+def plan_placement(
+    src_shape: Sequence[int],
+    center_px: Tuple[float, float],
+    angle_deg: float,
+    dpi: Tuple[float, float] | None = None,
+    angle_step: float | None = None,
+    right_angle_tol: float | None = None,
+) -> Placement:
+    """
+    Calcula una sola vez la transformación imagen base -> canvas de una copia:
+    - rotación `angle_deg` (horaria, como QGraphicsItem) alrededor del centro de la imagen,
+      aplicada en milímetros si `dpi=(dpi_x, dpi_y)` no es isótropo,
+    - traslación que lleva el centro de la imagen a `center_px` (índices de píxel del canvas).
+    Devuelve la inversa (canvas -> imagen base) y la huella entera que puede recibir tinta.
+
+    Con `angle_step` el ángulo se cuantiza a múltiplos de angle_step y el centro se
+    redondea a píxel entero: todas las copias con el mismo ángulo cuantizado son el
+    mismo parche desplazado y pueden compartirlo vía RotatedPatchCache. El precio es
+    hasta 0.5 px de desplazamiento y el desvío angular de las esquinas (radio * paso / 2);
+    RotatedPatchCache.step_for elige el paso para mantenerlo por debajo del píxel.
+
+    Con `right_angle_tol`, un ángulo a menos de esa tolerancia de un múltiplo de 90°
+    se ajusta a ese múltiplo y la copia se coloca sin interpolar (vista np.rot90,
+    centro redondeado a píxel entero): más rápido y exacto al píxel.
+    """
+    if right_angle_tol is not None:
+        q = int(round(float(angle_deg) / 90.0))
+        isotropic = dpi is None or not (dpi[0] and dpi[1]) or dpi[0] == dpi[1]
+        if abs(float(angle_deg) - 90.0 * q) <= right_angle_tol and (q % 2 == 0 or isotropic):
+            q %= 4
+            Hi, Wi = src_shape[:2]
+            Wr, Hr = (Hi, Wi) if q % 2 else (Wi, Hi)
+            x0 = int(round(center_px[0] - (Wr - 1) / 2.0))
+            y0 = int(round(center_px[1] - (Hr - 1) / 2.0))
+            exact = plan_placement(src_shape, (x0 + (Wr - 1) / 2.0, y0 + (Hr - 1) / 2.0), 90.0 * q, dpi)
+            return Placement(exact.inverse, x0, y0, Wr, Hr, quarter=q)
+
+    if angle_step:
+        angle_q = round(float(angle_deg) / angle_step) * angle_step
+        sx, sy = int(round(center_px[0])), int(round(center_px[1]))
+        base = plan_placement(src_shape, (0.0, 0.0), angle_q, dpi)
+        return Placement(base.inverse, base.x0 + sx, base.y0 + sy, base.width, base.height, angle_q, (sx, sy))
+
+    Hi, Wi = src_shape[:2]
+    cx_img = (Wi - 1) / 2.0
+    cy_img = (Hi - 1) / 2.0
+
+    a = math.radians(float(angle_deg))
+    cos_a, sin_a = math.cos(a), math.sin(a)
+    A = np.array([[cos_a, -sin_a], [sin_a, cos_a]], dtype=np.float64)
+    if dpi is not None and dpi[0] and dpi[1] and dpi[0] != dpi[1]:
+        # Rotar en mm: px -> mm -> rotación -> px
+        D = np.diag([float(dpi[0]), float(dpi[1])])
+        A = D @ A @ np.linalg.inv(D)
+
+    fwd = np.empty((2, 3), dtype=np.float64)
+    fwd[:, :2] = A
+    fwd[:, 2] = np.asarray(center_px, dtype=np.float64) - A @ (cx_img, cy_img)
+    inverse = cv2.invertAffineTransform(fwd)
+
+    # Huella: la interpolación lineal toca hasta un píxel fuera de la imagen base
+    corners = np.array([[-1.0, -1.0], [Wi, -1.0], [Wi, Hi], [-1.0, Hi]])
+    mapped = corners @ A.T + fwd[:, 2]
+    x0, y0 = np.floor(mapped.min(axis=0)).astype(int)
+    x1, y1 = np.ceil(mapped.max(axis=0)).astype(int) + 1
+    return Placement(inverse, int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+
+def compose_region(
+    region: np.ndarray,
+    src: np.ndarray,
+    placements: Iterable[Placement],
+    x_off: int = 0,
+    y_off: int = 0,
+    cache: Optional["RotatedPatchCache"] = None,
+    groups: Optional["ChannelGroups"] = None,
+) -> None:
+    """
+    Compone por MAX en `region` (vista del canvas cuyo origen es x_off, y_off)
+    solo la parte de cada huella que cae dentro de la región.
+    Con `cache`, las copias con shared_angle reutilizan el parche rotado compartido.
+    `groups`: canales de `src` ya agrupados por quien compone varias regiones con la
+    misma imagen base (si no, se agrupan para esta llamada).
+    """
+    if groups is None:
+        groups = ChannelGroups(src)
+    rh, rw = region.shape[:2]
+    for p in placements:
+        rx0 = max(p.x0, x_off); ry0 = max(p.y0, y_off)
+        rx1 = min(p.x1, x_off + rw); ry1 = min(p.y1, y_off + rh)
+        if rx1 <= rx0 or ry1 <= ry0:
+            continue
+
+        dst = region[ry0 - y_off:ry1 - y_off, rx0 - x_off:rx1 - x_off]
+        if p.quarter is not None:
+            # Giro recto: vista girada de la imagen base, sin interpolación
+            rot = np.rot90(src, -p.quarter)
+            _max_into(dst, rot[ry0 - p.y0:ry1 - p.y0, rx0 - p.x0:rx1 - p.x0])
+            continue
+        full = cache.patch(src, p, groups) if (cache is not None and p.shared_angle is not None) else None
+        if full is not None:
+            _max_into(dst, full[ry0 - p.y0:ry1 - p.y0, rx0 - p.x0:rx1 - p.x0])
+        else:
+            # Rasterizar únicamente el recorte visible, directo desde la imagen base
+            _warp_max(dst, groups, p.inverse, rx0 - p.shift[0], ry0 - p.shift[1])
+
+
+def compose_tiled(
+    region: np.ndarray,
+    src: np.ndarray,
+    placements: Sequence[Placement],
+    x_off: int = 0,
+    y_off: int = 0,
+    cache: Optional["RotatedPatchCache"] = None,
+    workers: int | None = None,
+    tile: Tuple[int, int] = DEFAULT_TILE,
+    pool: Executor | None = None,
+    progress: ProgressCallback | None = None,
+    dirty: Optional[set] = None,
+    groups: Optional["ChannelGroups"] = None,
+) -> None:
+    """
+    Igual que compose_region, pero reparte `region` en mosaicos disjuntos que se
+    componen en un pool de hilos (cv2 y NumPy liberan el GIL). Cada mosaico es dueño
+    de sus píxeles, así el MAX no tiene carreras, y como el valor de cada píxel no
+    depende del mosaico el resultado es idéntico bit a bit al serie.
+    - workers: hilos (None = núcleos disponibles, 1 = serie).
+    - pool: ejecutor ya creado para reutilizarlo entre llamadas.
+    - progress: se llama tras cada mosaico; si lanza, se cancelan los pendientes.
+    - dirty: si se da, solo se recomponen (desde cero) los mosaicos cuyo origen
+      (ty, tx) está en el conjunto; el resto de `region` no se toca.
+    """
+    if groups is None:
+        groups = ChannelGroups(src)
+    rh, rw = region.shape[:2]
+    th, tw = int(tile[0]), int(tile[1])
+    jobs = []
+    for ty in range(0, rh, th):
+        for tx in range(0, rw, tw):
+            if dirty is not None and (ty, tx) not in dirty:
+                continue
+            gx0, gy0 = x_off + tx, y_off + ty
+            gx1, gy1 = gx0 + min(tw, rw - tx), gy0 + min(th, rh - ty)
+            hits = [p for p in placements if p.x0 < gx1 and p.x1 > gx0 and p.y0 < gy1 and p.y1 > gy0]
+            if hits or dirty is not None:
+                jobs.append((region[ty:ty + th, tx:tx + tw], hits, gx0, gy0))
+
+    clear = dirty is not None
+    total = len(jobs)
+    if pool is None and (resolve_workers(workers) <= 1 or total <= 1):
+        for i, (view, hits, gx0, gy0) in enumerate(jobs):
+            _compose_tile(view, src, hits, gx0, gy0, cache, clear, groups)
+            if progress is not None:
+                progress(i + 1, total)
+        return
+
+    own = pool is None
+    ex = pool or ThreadPoolExecutor(max_workers=min(resolve_workers(workers), total))
+    futures = [
+        ex.submit(_compose_tile, view, src, hits, gx0, gy0, cache, clear, groups)
+        for view, hits, gx0, gy0 in jobs
+    ]
+    try:
+        for i, f in enumerate(futures):
+            f.result()
+            if progress is not None:
+                progress(i + 1, total)
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        raise
+    finally:
+        if own:
+            ex.shutdown()
+
+
+def resolve_workers(workers: int | None) -> int:
+    """Número efectivo de hilos (None o <= 0 -> núcleos disponibles)."""
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+def dirty_tiles(
+    rects: Iterable[Tuple[int, int, int, int]],
+    shape: Sequence[int],
+    tile: Tuple[int, int] = DEFAULT_TILE,
+) -> set:
+    """Orígenes (ty, tx) de los mosaicos que tocan algún rectángulo (x0, y0, x1, y1)."""
+    height, width = int(shape[0]), int(shape[1])
+    th, tw = int(tile[0]), int(tile[1])
+    out = set()
+    for x0, y0, x1, y1 in rects:
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(width, x1), min(height, y1)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        for ty in range(y0 // th * th, y1, th):
+            for tx in range(x0 // tw * tw, x1, tw):
+                out.add((ty, tx))
+    return out
+
+
+class IncrementalCompositor:
+    """
+    Conserva el último canvas y la colocación con que se pintó cada item.
+    En la siguiente composición solo se recomponen los mosaicos que tocan la huella
+    vieja o nueva de los items añadidos, quitados, movidos o girados; el resultado es
+    idéntico a componer todo desde cero. Seguro entre hilos.
+    """
+
+    def __init__(self, tile: Tuple[int, int] = DEFAULT_TILE) -> None:
+        self.tile = (int(tile[0]), int(tile[1]))
+        self._canvas: Optional[np.ndarray] = None
+        self._src_ref: Optional[weakref.ref] = None
+        self._placed: Dict[Hashable, Placement] = {}
+        self._lock = threading.Lock()
+        # Mosaicos recompuestos / totales en la última llamada a compose()
+        self.last_dirty = 0
+        self.last_total = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def compose(
+        self,
+        src: np.ndarray,
+        placements: Dict[Hashable, Placement],
+        shape: Sequence[int],
+        cache: Optional["RotatedPatchCache"] = None,
+        workers: int | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> np.ndarray:
+        """
+        Actualiza y retorna el canvas (solo lectura) para `placements` {clave de item: colocación}.
+        Si cambian la imagen base, la forma o el dtype se recompone completo.
+        """
+        shape = tuple(int(n) for n in shape)
+        with self._lock:
+            th, tw = self.tile
+            self.last_total = ((shape[0] + th - 1) // th) * ((shape[1] + tw - 1) // tw)
+            canvas = self._canvas
+            if (
+                canvas is None
+                or canvas.shape != shape
+                or canvas.dtype != src.dtype
+                or self._src_ref is None
+                or self._src_ref() is not src
+            ):
+                canvas = np.zeros(shape, dtype=src.dtype)  # CMYK blanco = 0
+                dirty = None
+            else:
+                rects = []
+                for key in self._placed.keys() | placements.keys():
+                    old, new = self._placed.get(key), placements.get(key)
+                    if old is not None and new is not None and _same_placement(old, new):
+                        continue
+                    rects.extend((p.x0, p.y0, p.x1, p.y1) for p in (old, new) if p is not None)
+                dirty = dirty_tiles(rects, shape, self.tile)
+
+            self.last_dirty = self.last_total if dirty is None else len(dirty)
+            try:
+                compose_tiled(
+                    canvas, src, list(placements.values()), cache=cache, workers=workers,
+                    tile=self.tile, progress=progress, dirty=dirty,
+                )
+            except BaseException:
+                # Canvas a medio actualizar: la próxima vez se recompone completo
+                self._reset()
+                raise
+            self._canvas = canvas
+            self._src_ref = weakref.ref(src)
+            self._placed = dict(placements)
+            view = canvas.view()
+            view.flags.writeable = False
+            return view
+
+    def _reset(self) -> None:
+        self._canvas = None
+        self._src_ref = None
+        self._placed = {}
+
+
+def band_rows_for(shape: Sequence[int], dtype: np.dtype, budget: int = DEFAULT_BAND_BYTES) -> int:
+    """Número de filas por banda para no superar `budget` bytes."""
+    row_bytes = int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
+    return int(max(1, min(shape[0], budget // max(1, row_bytes))))
+
+
+def iter_bands(
+    src: np.ndarray,
+    placements: Sequence[Placement],
+    shape: Sequence[int],
+    band_rows: int,
+    cache: Optional["RotatedPatchCache"] = None,
+    workers: int | None = 1,
+    progress: ProgressCallback | None = None,
+) -> Iterator[np.ndarray]:
+    """
+    Genera el canvas por bandas horizontales de `band_rows` filas.
+    Cada banda solo compone los items cuya huella rotada la cruza, así que la
+    memoria pico queda acotada por el tamaño de banda y no por la mesa.
+    Con workers != 1 cada banda se compone por mosaicos en un pool compartido.
+    `progress` se llama tras componer cada banda (si lanza, se detiene la generación).
+    """
+    height = int(shape[0])
+    total = (height + band_rows - 1) // band_rows
+    tail = tuple(shape[1:])
+    n = resolve_workers(workers)
+    pool = ThreadPoolExecutor(max_workers=n) if n > 1 else None
+    # Canales agrupados una vez para todas las bandas; se liberan con el generador
+    groups = ChannelGroups(src)
+    try:
+        for y in range(0, height, band_rows):
+            rows = min(band_rows, height - y)
+            band = np.zeros((rows,) + tail, dtype=src.dtype)  # CMYK blanco = 0
+            hits: List[Placement] = [p for p in placements if p.y0 < y + rows and p.y1 > y]
+            if pool is None:
+                compose_region(band, src, hits, 0, y, cache, groups)
+            else:
+                compose_tiled(band, src, hits, 0, y, cache, pool=pool, groups=groups)
+            if progress is not None:
+                progress(y // band_rows + 1, total)
+            yield band
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+class RotatedPatchCache:
+    """
+    Caché LRU de parches rotados compartidos entre copias con el mismo ángulo.
+
+    La clave es (identidad de la imagen base, ángulo cuantizado, interpolación,
+    parte lineal de la afín); el tamaño total se limita a `max_bytes`. Los parches
+    que no caben en el presupuesto se rasterizan sin guardarse. Seguro entre hilos.
+
+    Compartir parches cambia la geometría respecto del rasterizado exacto: el centro
+    de cada copia se redondea a píxel entero (hasta 0.5 px) y el ángulo se cuantiza.
+    Sin `angle_step` el paso sale del tamaño de la imagen (ver step_for), de modo que
+    las esquinas se desvían a lo sumo `max_error_px` por la cuantización del ángulo.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512 * 1024 * 1024,
+        angle_step: float | None = None,
+        max_error_px: float = 0.25,
+    ) -> None:
+        self.max_bytes = int(max_bytes)
+        self.angle_step = float(angle_step) if angle_step else None
+        self.max_error_px = float(max_error_px)
+        self._entries: "OrderedDict[tuple, Tuple[weakref.ref, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def step_for(self, src_shape: Sequence[int], dpi: Tuple[float, float] | None = None) -> float:
+        """
+        Paso de cuantización del ángulo (grados) para una imagen base `src_shape`:
+        redondear al múltiplo más cercano desvía las esquinas a lo sumo
+        radio * paso / 2, y se elige el paso para que eso no pase de max_error_px.
+        """
+        if self.angle_step:
+            return self.angle_step
+        h, w = src_shape[:2]
+        radius = 0.5 * math.hypot(w, h)
+        if dpi is not None and dpi[0] and dpi[1]:
+            # Rotar en mm con DPI distintos estira el desvío en el eje de más DPI
+            radius *= max(dpi[0], dpi[1]) / min(dpi[0], dpi[1])
+        return math.degrees(2.0 * self.max_error_px / max(radius, 1.0))
+
+    def patch(
+        self,
+        src: np.ndarray,
+        placement: Placement,
+        groups: Optional["ChannelGroups"] = None,
+    ) -> Optional[np.ndarray]:
+        """Parche completo (height x width) de la huella; None si excede el presupuesto."""
+        key = (
+            id(src),
+            round(float(placement.shared_angle), 6),
+            INTERPOLATION,
+            placement.width,
+            placement.height,
+            tuple(np.round(placement.inverse[:, :2], 12).ravel()),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is src:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        nbytes = placement.width * placement.height * src.itemsize * (src.shape[2] if src.ndim == 3 else 1)
+        if nbytes > self.max_bytes:
+            return None
+        patch = np.zeros((placement.height, placement.width) + src.shape[2:], dtype=src.dtype)
+        _warp_max(patch, groups if groups is not None else ChannelGroups(src),
+                  placement.inverse, placement.x0 - placement.shift[0], placement.y0 - placement.shift[1])
+        patch.flags.writeable = False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].nbytes
+            self._entries[key] = (weakref.ref(src), patch)
+            self._bytes += patch.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return patch
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Aciertos, fallos, desalojos y ocupación actual."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+class ChannelGroups:
+    """
+    Canales de una imagen base en grupos contiguos de 4, 3 o 1 (lo que cv2.remap
+    interpola de una vez). Con 1, 3 o 4 canales contiguos no hay copia; con más, cada
+    grupo es una copia del tamaño de la imagen base / canales * n, hecha al primer uso.
+    Vive lo que la composición que lo crea (compose_region, compose_tiled, iter_bands)
+    y las copias se liberan con él. Seguro entre hilos.
+    """
+
+    def __init__(self, src: np.ndarray) -> None:
+        self.src = src
+        self._groups: Optional[List[Tuple[int, np.ndarray]]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> List[Tuple[int, np.ndarray]]:
+        """[(primer canal, grupo H x W[ x n])]."""
+        with self._lock:
+            if self._groups is None:
+                self._groups = _channel_groups(self.src)
+            return self._groups
+
+
+# --- Helpers internos ---
+
+def _compose_tile(
+    view: np.ndarray,
+    src: np.ndarray,
+    hits: Sequence[Placement],
+    x_off: int,
+    y_off: int,
+    cache: Optional["RotatedPatchCache"],
+    clear: bool,
+    groups: "ChannelGroups",
+) -> None:
+    if clear:
+        view[...] = 0
+    compose_region(view, src, hits, x_off, y_off, cache, groups)
+
+
+def _same_placement(a: Placement, b: Placement) -> bool:
+    return (
+        (a.x0, a.y0, a.width, a.height, a.shared_angle, a.shift, a.quarter)
+        == (b.x0, b.y0, b.width, b.height, b.shared_angle, b.shift, b.quarter)
+        and np.array_equal(a.inverse, b.inverse)
+    )
+
+
+# Canales que OpenCV interpola de forma nativa en una sola llamada.
+_MAX_GROUP = 4
+# Buffers de trabajo por hilo (mapas y bloque remapeado), reutilizados entre items.
+_scratch = threading.local()
+
+
+def _warp_max(dst: np.ndarray, groups: "ChannelGroups", inverse: np.ndarray, x0: int, y0: int) -> None:
+    """
+    Rasteriza la imagen base de `groups` en el rectángulo [x0, x0+w) x [y0, y0+h) del
+    marco de `inverse` y lo compone por MAX en `dst` (h x w [x C]), bloque a bloque y
+    sin parche intermedio.
+    Las coordenadas de origen se calculan desde las coordenadas absolutas del marco,
+    así el valor de cada píxel no depende del recorte, banda o mosaico evaluado.
+    Los canales se interpolan en grupos contiguos de hasta 4 que comparten los mapas.
+    """
+    height, width = dst.shape[:2]
+    xs = np.arange(x0, x0 + width, dtype=np.float64)
+    ax = inverse[0, 0] * xs
+    ay = inverse[1, 0] * xs
+    for r in range(0, height, _MAP_ROWS):
+        rows = min(_MAP_ROWS, height - r)
+        ys = np.arange(y0 + r, y0 + r + rows, dtype=np.float64)[:, None]
+        map_x = _buffer("map_x", (rows, width), np.float32)
+        map_y = _buffer("map_y", (rows, width), np.float32)
+        np.add(ax, inverse[0, 1] * ys + inverse[0, 2], out=map_x)
+        np.add(ay, inverse[1, 1] * ys + inverse[1, 2], out=map_y)
+        block = dst[r:r + rows]
+        for c0, grp in groups.get():
+            out = _buffer("warp", (rows, width) + grp.shape[2:], grp.dtype)
+            cv2.remap(
+                grp, map_x, map_y,
+                interpolation=INTERPOLATION,
+                borderMode=cv2.BORDER_CONSTANT,
+                borderValue=0,  # 0 = sin tinta
+                dst=out,
+            )
+            if block.ndim == 2:
+                target = block
+            elif grp.ndim == 2:
+                target = block[:, :, c0]
+            else:
+                target = block[:, :, c0:c0 + grp.shape[2]]
+            np.maximum(target, out, out=target)
+
+
+def _channel_groups(src: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """Divide `src` en grupos contiguos de 4, 3 o 1 canales."""
+    if src.ndim == 2 or src.shape[2] in (1, 3, 4):
+        grp = np.ascontiguousarray(src)
+        return [(0, grp[:, :, 0] if grp.ndim == 3 and grp.shape[2] == 1 else grp)]
+    groups: List[Tuple[int, np.ndarray]] = []
+    c0 = 0
+    for n in _group_sizes(src.shape[2]):
+        grp = np.ascontiguousarray(src[:, :, c0:c0 + n])
+        groups.append((c0, grp[:, :, 0] if n == 1 else grp))
+        c0 += n
+    return groups
+
+
+def _group_sizes(channels: int) -> List[int]:
+    """Tamaños de grupo en {4, 3, 1}: cv2.remap con 2 canales no coincide con canal a canal."""
+    sizes: List[int] = []
+    rem = channels
+    while rem > 0:
+        if rem == 2:
+            n = 1
+        elif rem % 4 == 2:
+            n = 3
+        else:
+            n = min(_MAX_GROUP, rem)
+        sizes.append(n)
+        rem -= n
+    return sizes
+
+
+def _buffer(name: str, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+    """Vista contigua de un buffer por hilo que solo crece cuando hace falta."""
+    dtype = np.dtype(dtype)
+    n = int(np.prod(shape))
+    buf = getattr(_scratch, name, None)
+    if buf is None or buf.dtype != dtype or buf.size < n:
+        buf = np.empty(n, dtype=dtype)
+        setattr(_scratch, name, buf)
+    return buf[:n].reshape(shape)
+
+
+def _max_into(dst: np.ndarray, src: np.ndarray) -> None:
+    """MAX por canal: evita que ceros del parche borren tinta previa."""
+    if dst.ndim == 3 and src.ndim == 2:
+        src = src[..., None]
+    if dst.ndim == 3 and src.shape[2] < dst.shape[2]:
+        # Mezcla solo los canales presentes en src
+        dst = dst[:, :, :src.shape[2]]
+    np.maximum(dst, src, out=dst)
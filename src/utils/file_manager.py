@@ -3,8 +3,12 @@
 
 from __future__ import annotations
 
+import importlib.util
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, TYPE_CHECKING, Any, Dict, Tuple
+from typing import Optional, TYPE_CHECKING, Any, Dict, Iterable, Iterator, Tuple
 
 import cv2
 import numpy as np
@@ -16,6 +20,20 @@ from .tools import (
     _compute_size_mm,
 )
 
+# Compresiones de exportación -> códec de tifffile ('lzw' y 'zstd' requieren imagecodecs).
+TIFF_COMPRESSIONS = {"lzw": "lzw", "deflate": "zlib", "zstd": "zstd"}
+_IMAGECODECS_COMPRESSIONS = {"lzw", "zstd"}
+# Mosaico por defecto para salidas comprimidas.
+DEFAULT_TIFF_TILE = (256, 256)
+# Por encima de esto los offsets de 32 bits no alcanzan (se deja margen para tags).
+_BIGTIFF_THRESHOLD = 2**32 - 2**25
+# Filas por bloque al generar previsualizaciones RGBA8.
+_PREVIEW_CHUNK_ROWS = 256
+# uint16 -> uint8 redondeando /257, igual que la conversión por canal.
+_U16_TO_U8 = (np.arange(65536) / 257.0).round().astype(np.uint8)
+# Orden de bytes de la máquina en la notación de tifffile.
+_NATIVE_BYTEORDER = "<" if sys.byteorder == "little" else ">"
+
 
 def load_scan_table(path: Path) -> np.ndarray:
     if not path.exists():
@@ -24,7 +42,7 @@ def load_scan_table(path: Path) -> np.ndarray:
     try:       
         image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
         if image is not None and image.ndim == 3 and image.shape[2] == 3:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)  # en el mismo buffer
     except Exception:
         return None
 
@@ -42,10 +60,12 @@ def load_scan_table(path: Path) -> np.ndarray:
 
     return array
     
-def load_tif(path: Path) -> Optional[Dict[str, Any]]:
+def load_tif(path: Path, lazy: bool = True) -> Optional[Dict[str, Any]]:
     """
     Carga un TIF y retorna un dict con:
-      - pixels: np.ndarray (H, W, C) o (H, W, 1) si era gris
+      - pixels: np.ndarray (H, W, C) o (H, W, 1) si era gris; con lazy=True y datos
+        sin comprimir y contiguos es una vista de solo lectura de un mapeo en memoria
+        (los píxeles se leen del disco al tocarlos y la caché del SO se comparte)
       - dpi_x, dpi_y: float|None
       - width_mm, height_mm: float|None
       - photometric: str|None
@@ -61,58 +81,10 @@ def load_tif(path: Path) -> Optional[Dict[str, Any]]:
     try:
         with tifffile.TiffFile(str(path)) as tif:
             page = tif.pages[0]
-            image = page.asarray()
-            tags = page.tags
-
-            photometric = (page.photometric.name.lower() if page.photometric else None)
-            extras = list(page.extrasamples) if page.extrasamples is not None else []
-            alpha_index = None
-
-            # ICC profile
-            icc = None
-            icc_tag = tags.get("ICCProfile")
-            if icc_tag is not None:
-                icc = icc_tag.value  # bytes
-
-            # InkNames / orden de CMYK
-            ink_names = None
-            cmyk_order = None
-            inknames_tag = tags.get("InkNames")
-            if photometric == "separated":
-                if inknames_tag is not None:
-                    raw = inknames_tag.value
-                    if isinstance(raw, (bytes, bytearray)):
-                        ink_names = [n for n in raw.decode("latin1").split("\x00") if n]
-                    elif isinstance(raw, str):
-                        ink_names = [n for n in raw.split("\x00") if n]
-                if ink_names:
-                    def idx_of(tgt: str):
-                        for i, n in enumerate(ink_names):
-                            nn = n.strip().lower()
-                            if tgt in nn:
-                                return i
-                        return None
-                    iC, iM, iY = idx_of("cyan"), idx_of("magenta"), idx_of("yellow")
-                    iK = idx_of("black") or idx_of("key")
-                    if None not in (iC, iM, iY, iK):
-                        cmyk_order = (iC, iM, iY, iK)
-                if extras:
-                    alpha_index = image.shape[2] - 1
-
-            # DPI
-            unit_tag = tags.get("ResolutionUnit")
-            unit_code = int(unit_tag.value) if unit_tag else None
-            x_res_tag = tags.get("XResolution")
-            y_res_tag = tags.get("YResolution")
-
-            dpi_x = _apply_resolution_unit(
-                _rational_to_float(x_res_tag.value if x_res_tag else None),
-                unit_code,
-            )
-            dpi_y = _apply_resolution_unit(
-                _rational_to_float(y_res_tag.value if y_res_tag else None),
-                unit_code,
-            )
+            image = _memmap_page(path, tif, page) if lazy else None
+            if image is None:
+                image = page.asarray()
+            info = _page_metadata(page)
     except Exception:
         return None
 
@@ -120,10 +92,86 @@ def load_tif(path: Path) -> Optional[Dict[str, Any]]:
     if arr.ndim == 2:
         arr = arr[..., np.newaxis]
 
-    width_mm, height_mm = _compute_size_mm(arr.shape[:2], dpi_x, dpi_y)
+    return {"pixels": arr, **info}
+
+
+def probe_tif(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Como load_tif pero sin leer píxeles: solo analiza los tags de la primera página.
+    Retorna los mismos metadatos (sin "pixels") más "shape" (H, W, C), o None.
+    """
+    if not path.exists() or path.suffix.lower() != ".tif":
+        return None
+
+    try:
+        with tifffile.TiffFile(str(path)) as tif:
+            info = _page_metadata(tif.pages[0])
+    except Exception:
+        return None
+    return info
+
+
+def _page_metadata(page: tifffile.TiffPage) -> Dict[str, Any]:
+    """Metadatos de load_tif leídos solo de los tags de `page`, más "shape" (H, W, C)."""
+    tags = page.tags
+    shape = tuple(int(n) for n in page.shape)
+    if len(shape) == 2:
+        shape = shape + (1,)
+
+    photometric = (page.photometric.name.lower() if page.photometric else None)
+    extras = list(page.extrasamples) if page.extrasamples is not None else []
+    alpha_index = None
+
+    # ICC profile
+    icc = None
+    icc_tag = tags.get("ICCProfile")
+    if icc_tag is not None:
+        icc = icc_tag.value  # bytes
+
+    # InkNames / orden de CMYK
+    ink_names = None
+    cmyk_order = None
+    inknames_tag = tags.get("InkNames")
+    if photometric == "separated":
+        if inknames_tag is not None:
+            raw = inknames_tag.value
+            if isinstance(raw, (bytes, bytearray)):
+                ink_names = [n for n in raw.decode("latin1").split("\x00") if n]
+            elif isinstance(raw, str):
+                ink_names = [n for n in raw.split("\x00") if n]
+        if ink_names:
+            def idx_of(tgt: str):
+                for i, n in enumerate(ink_names):
+                    nn = n.strip().lower()
+                    if tgt in nn:
+                        return i
+                return None
+            iC, iM, iY = idx_of("cyan"), idx_of("magenta"), idx_of("yellow")
+            iK = idx_of("black") or idx_of("key")
+            if None not in (iC, iM, iY, iK):
+                cmyk_order = (iC, iM, iY, iK)
+        if extras:
+            alpha_index = shape[2] - 1
+
+    # DPI
+    unit_tag = tags.get("ResolutionUnit")
+    unit_code = int(unit_tag.value) if unit_tag else None
+    x_res_tag = tags.get("XResolution")
+    y_res_tag = tags.get("YResolution")
+
+    dpi_x = _apply_resolution_unit(
+        _rational_to_float(x_res_tag.value if x_res_tag else None),
+        unit_code,
+    )
+    dpi_y = _apply_resolution_unit(
+        _rational_to_float(y_res_tag.value if y_res_tag else None),
+        unit_code,
+    )
+
+    width_mm, height_mm = _compute_size_mm(shape[:2], dpi_x, dpi_y)
 
     return {
-        "pixels": arr,
+        "shape": shape,
         "dpi_x": dpi_x,
         "dpi_y": dpi_y,
         "width_mm": width_mm,
@@ -135,74 +183,117 @@ def load_tif(path: Path) -> Optional[Dict[str, Any]]:
         "ink_names": ink_names,
     }
 
+
+def _memmap_page(path: Path, tif: tifffile.TiffFile, page: tifffile.TiffPage) -> Optional[np.ndarray]:
+    """
+    Mapea en memoria la primera página si sus datos están sin comprimir, contiguos y
+    en el orden de bytes nativo (cv2 no acepta big-endian). None si no es posible.
+    """
+    if not page.is_memmappable:
+        return None
+    if page.dtype.itemsize > 1 and tif.byteorder != _NATIVE_BYTEORDER:
+        return None
+    try:
+        return tifffile.memmap(str(path), page=0, mode="r")
+    except Exception:
+        return None
+
+
 def to_rgba8_preview(
     pixels: np.ndarray,
     photometric: Optional[str],
     cmyk_order: Optional[Tuple[int, int, int, int]],
     alpha_index: Optional[int],
+    workers: int | None = None,
 ) -> Optional[np.ndarray]:
     """
     Convierte un arreglo de imagen (cualquier dtype) a RGBA8 para previsualización.
     - Preserva alpha si alpha_index es válido.
     - Soporta CMYK (photometric='separated') con orden dado por cmyk_order.
     - No modifica `pixels`; retorna un nuevo np.ndarray (H, W, 4) dtype=uint8.
+    - Escribe directo en un único buffer RGBA8, por bloques de filas repartidos en
+      `workers` hilos (None = núcleos disponibles); uint16 pasa por una LUT y
+      CMYK -> RGB se hace en uint8 con suma saturada.
     """
     if pixels is None or pixels.size == 0:
         return None
     arr = np.asarray(pixels)
     if arr.ndim == 2:
         # Gris → RGB + A=255
-        g = _to_u8(arr)
-        a = np.full_like(g, 255, dtype=np.uint8)
-        return np.ascontiguousarray(np.dstack([g, g, g, a]))
-
+        arr = arr[..., np.newaxis]
+        alpha_index = None
     if arr.ndim != 3:
         return None
 
     h, w, c = arr.shape
-    # Alpha
     has_alpha = alpha_index is not None and 0 <= alpha_index < c
-    A = _to_u8(arr[..., alpha_index]) if has_alpha else np.full((h, w), 255, dtype=np.uint8)
-
-    # CMYK → RGB
-    if (photometric or "").lower() == "separated" and c >= 4:
+    a_src = alpha_index if has_alpha else None
+    separated = (photometric or "").lower() == "separated" and c >= 4
+    if separated:
+        # CMYK → RGB: R = 255 - min(255, C + K), ídem G con M y B con Y
         order = cmyk_order if cmyk_order else (0, 1, 2, 3)
-        C = _to_u8(arr[..., order[0]]).astype(np.float32) / 255.0
-        M = _to_u8(arr[..., order[1]]).astype(np.float32) / 255.0
-        Y = _to_u8(arr[..., order[2]]).astype(np.float32) / 255.0
-        K = _to_u8(arr[..., order[3]]).astype(np.float32) / 255.0
-        R = (1.0 - np.minimum(1.0, C + K))
-        G = (1.0 - np.minimum(1.0, M + K))
-        B = (1.0 - np.minimum(1.0, Y + K))
-        R8 = (R * 255.0).round().astype(np.uint8)
-        G8 = (G * 255.0).round().astype(np.uint8)
-        B8 = (B * 255.0).round().astype(np.uint8)
-        return np.ascontiguousarray(np.dstack([R8, G8, B8, A]))
-
-    # RGB / RGBA / Gray+Alpha u otros
-    if c >= 3:
-        R = _to_u8(arr[..., 0])
-        G = _to_u8(arr[..., 1])
-        B = _to_u8(arr[..., 2])
-        # Si no se indicó alpha_index pero hay 4º canal, úsalo como alpha de cortesía
+        rgb_src = (order[0], order[1], order[2])
+        k_src = order[3]
+    elif c >= 3:
+        # RGB / RGBA; si no se indicó alpha_index pero hay 4º canal, se usa como alpha de cortesía
+        rgb_src = (0, 1, 2)
         if not has_alpha and c >= 4:
-            A = _to_u8(arr[..., 3])
-        return np.ascontiguousarray(np.dstack([R, G, B, A]))
-
-    if c == 2:
+            a_src = 3
+    elif c == 2:
         # Asumimos [Gray, Alpha] si no se especifica
-        if has_alpha:
-            gray_chan = 1 - int(alpha_index == 0)  # si alpha es 0, gris es 1; si alpha es 1, gris es 0
+        gray_chan = 1 - int(alpha_index == 0) if has_alpha else 0
+        rgb_src = (gray_chan,) * 3
+    else:
+        rgb_src = (0, 0, 0)
+
+    used = sorted(set(rgb_src) | ({k_src} if separated else set()) | ({a_src} if a_src is not None else set()))
+    rows = _PREVIEW_CHUNK_ROWS
+    chunks = [(y, min(h, y + rows)) for y in range(0, h, rows)]
+    n_workers = min(len(chunks), workers if workers and workers > 0 else (os.cpu_count() or 1))
+
+    def run(fn, jobs):
+        if n_workers <= 1:
+            return [fn(*job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=n_workers) as ex:
+            return list(ex.map(lambda job: fn(*job), jobs))
+
+    # 1) Parámetros de cada canal (rango min/max solo para float y enteros distintos de u8/u16)
+    params = {}
+    ranged = [ch for ch in used if arr.dtype not in (np.uint8, np.uint16)]
+    if ranged:
+        parts = run(lambda y0, y1: _u8_chunk_range(arr[y0:y1], ranged), chunks)
+        for i, ch in enumerate(ranged):
+            params[ch] = _u8_params(
+                arr.dtype, min(p[i][0] for p in parts), max(p[i][1] for p in parts)
+            )
+    for ch in used:
+        params.setdefault(ch, _u8_params(arr.dtype, 0.0, 0.0))
+
+    # 2) Conversión por bloques sobre el buffer de salida
+    out = np.empty((h, w, 4), dtype=np.uint8)
+
+    def fill(y0: int, y1: int) -> None:
+        block = arr[y0:y1]
+        dst = out[y0:y1]
+        if separated:
+            k8 = _to_u8(block[..., k_src], params[k_src])
+            for i, ch in enumerate(rgb_src):
+                ink = cv2.add(_to_u8(block[..., ch], params[ch]), k8)  # satura en 255
+                np.subtract(255, ink, out=dst[..., i])
         else:
-            gray_chan = 0
-        GY = _to_u8(arr[..., gray_chan])
-        return np.ascontiguousarray(np.dstack([GY, GY, GY, A]))
-
-    if c == 1:
-        GY = _to_u8(arr[..., 0])
-        return np.ascontiguousarray(np.dstack([GY, GY, GY, A]))
+            done = {}
+            for i, ch in enumerate(rgb_src):
+                if ch in done:
+                    dst[..., i] = done[ch]
+                else:
+                    dst[..., i] = done[ch] = _to_u8(block[..., ch], params[ch])
+        if a_src is None:
+            dst[..., 3] = 255
+        else:
+            dst[..., 3] = _to_u8(block[..., a_src], params[a_src])
 
-    return None
+    run(fill, chunks)
+    return out
 
 def save_result(
     path: Path,
@@ -215,81 +306,223 @@ def save_result(
     extrasamples: list[int] | None = None,
     number_of_inks: int | None = None,
     inkset: int | None = None,  # 1 = CMYK
+    compression: str | None = None,
+    predictor: bool = True,
+    tile: Tuple[int, int] | None = None,
+    maxworkers: int | None = None,
 ) -> bool:
-    try:
-        kws = {
-            "append": False,     # <- NO anexar páginas
-            "bigtiff": False,    # opcional
-            "imagej": False,     # opcional
-        }
-        if photometric:
-            kws["photometric"] = photometric  # 'rgb' | 'minisblack' | 'separated'
-        if dpi_x and dpi_y:
-            kws["resolution"] = (float(dpi_x), float(dpi_y))
-            kws["resolutionunit"] = "INCH"
-        if icc_profile:
-            kws["iccprofile"] = icc_profile
-
-        extratags = []
-        # InkNames (id 333), NumberOfInks (id 334), InkSet (id 332)
-        if ink_names:
-            payload = ("\x00".join(ink_names) + "\x00").encode("latin1")
-            extratags.append((333, "B", len(payload), payload, True))
-        if number_of_inks is not None:
-            extratags.append((334, "H", 1, number_of_inks, True))
-        if inkset is not None:
-            extratags.append((332, "H", 1, inkset, True))
-        # ExtraSamples (id 338) SOLO si realmente es alfa
-        if extrasamples:
-            extratags.append((338, "H", len(extrasamples), extrasamples, True))
-        if extratags:
-            kws["extratags"] = extratags
-
-        tifffile.imwrite(str(path), image, **kws)
-        return True
-    except Exception:
-        return False
+    """
+    Escribe `image` como TIF. BigTIFF se elige solo si los datos no caben en 4 GB.
+    - compression: None | 'lzw' | 'deflate' | 'zstd' ('lzw' y 'zstd' requieren imagecodecs).
+    - predictor: predictor horizontal cuando hay compresión.
+    - tile=(th, tw): mosaicos (múltiplos de 16) en vez de tiras.
+    - maxworkers: hilos de codificación de tifffile.
+    Los errores de escritura (códec que requiere imagecodecs, disco lleno...) se
+    propagan con su causa para poder mostrarla; el archivo puede quedar a medias.
+    """
+    kws = _tiff_write_kwargs(
+        image.shape, image.dtype,
+        photometric, dpi_x, dpi_y, icc_profile,
+        ink_names, extrasamples, number_of_inks, inkset,
+        compression, predictor, maxworkers,
+    )
+    if tile is not None:
+        kws["tile"] = tuple(tile)
+    tifffile.imwrite(str(path), image, **kws)
+    return True
+
+def save_result_bands(
+    path: Path,
+    bands: Iterable[np.ndarray],
+    shape: Tuple[int, ...],
+    dtype: np.dtype,
+    rows_per_band: int,
+    tile: Tuple[int, int] | None = None,
+    photometric: str | None = None,
+    dpi_x: float | None = None,
+    dpi_y: float | None = None,
+    icc_profile: bytes | None = None,
+    ink_names: list[str] | None = None,
+    extrasamples: list[int] | None = None,
+    number_of_inks: int | None = None,
+    inkset: int | None = None,  # 1 = CMYK
+    compression: str | None = None,
+    predictor: bool = True,
+    maxworkers: int | None = None,
+) -> bool:
+    """
+    Escribe un TIF a partir de bandas horizontales sin tener la imagen completa en memoria.
+    - bands: iterable de arrays (rows_per_band, W[, C]) en orden; la última puede ser menor.
+    - tile=None: TIF por tiras (RowsPerStrip = rows_per_band). Con compresión se usan
+      mosaicos DEFAULT_TIFF_TILE, porque tifffile solo comprime tiras de página completa.
+    - tile=(th, tw): TIF en mosaicos; rows_per_band debe ser múltiplo de th.
+    - compression / predictor / maxworkers: como en save_result.
+    Los errores se propagan como en save_result (también los que lance `bands`).
+    """
+    kws = _tiff_write_kwargs(
+        shape, dtype,
+        photometric, dpi_x, dpi_y, icc_profile,
+        ink_names, extrasamples, number_of_inks, inkset,
+        compression, predictor, maxworkers,
+    )
+    if tile is None and compression:
+        tile = DEFAULT_TIFF_TILE
+    if tile is not None:
+        if rows_per_band % tile[0]:
+            raise ValueError("rows_per_band debe ser múltiplo del alto del mosaico")
+        kws["tile"] = tuple(tile)
+        segments = _split_tiles(bands, tuple(tile))
+    else:
+        kws["rowsperstrip"] = int(rows_per_band)
+        segments = iter(bands)
+    tifffile.imwrite(str(path), segments, shape=tuple(shape), dtype=np.dtype(dtype), **kws)
+    return True
+
+def create_result_memmap(
+    path: Path,
+    shape: Tuple[int, ...],
+    dtype: np.dtype,
+    photometric: str | None = None,
+    dpi_x: float | None = None,
+    dpi_y: float | None = None,
+    icc_profile: bytes | None = None,
+    ink_names: list[str] | None = None,
+    extrasamples: list[int] | None = None,
+    number_of_inks: int | None = None,
+    inkset: int | None = None,  # 1 = CMYK
+) -> np.memmap:
+    """
+    Crea el TIF de salida (sin comprimir, contiguo, con todos sus tags) y retorna
+    sus píxeles como np.memmap escribible. Lo que se componga ahí va directo al
+    archivo vía page cache; basta con flush() para finalizarlo. Los errores se
+    propagan como en save_result.
+    """
+    kws = _tiff_write_kwargs(
+        shape, dtype,
+        photometric, dpi_x, dpi_y, icc_profile,
+        ink_names, extrasamples, number_of_inks, inkset,
+    )
+    return tifffile.memmap(str(path), shape=tuple(shape), dtype=np.dtype(dtype), **kws)
 
 # --- Helpers internos mínimos (privados al módulo) ---
 
-def _to_u8(ch: np.ndarray) -> np.ndarray:
+def _tiff_write_kwargs(
+    shape: Tuple[int, ...],
+    dtype: np.dtype,
+    photometric: str | None,
+    dpi_x: float | None,
+    dpi_y: float | None,
+    icc_profile: bytes | None,
+    ink_names: list[str] | None,
+    extrasamples: list[int] | None,
+    number_of_inks: int | None,
+    inkset: int | None,
+    compression: str | None = None,
+    predictor: bool = True,
+    maxworkers: int | None = None,
+) -> Dict[str, Any]:
+    """Argumentos comunes de tifffile.imwrite (formato, compresión, tags de color, DPI y tintas)."""
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    kws: Dict[str, Any] = {
+        "append": False,     # <- NO anexar páginas
+        "bigtiff": nbytes >= _BIGTIFF_THRESHOLD,
+        "imagej": False,     # opcional
+    }
+    if compression:
+        codec = TIFF_COMPRESSIONS.get(compression.lower())
+        if codec is None:
+            raise ValueError(f"Compresión no soportada: {compression}")
+        if codec in _IMAGECODECS_COMPRESSIONS and importlib.util.find_spec("imagecodecs") is None:
+            # Sin esto tifffile falla recién al codificar y con un mensaje poco claro
+            raise ValueError(f"La compresión {compression} requiere el paquete imagecodecs")
+        kws["compression"] = codec
+        if predictor:
+            kws["predictor"] = True  # horizontal para enteros
+    if maxworkers:
+        kws["maxworkers"] = int(maxworkers)
+    if photometric:
+        kws["photometric"] = photometric  # 'rgb' | 'minisblack' | 'separated'
+    if dpi_x and dpi_y:
+        kws["resolution"] = (float(dpi_x), float(dpi_y))
+        kws["resolutionunit"] = "INCH"
+    if icc_profile:
+        kws["iccprofile"] = icc_profile
+
+    extratags = []
+    # InkNames (id 333), NumberOfInks (id 334), InkSet (id 332)
+    if ink_names:
+        payload = ("\x00".join(ink_names) + "\x00").encode("latin1")
+        extratags.append((333, "B", len(payload), payload, True))
+    if number_of_inks is not None:
+        extratags.append((334, "H", 1, number_of_inks, True))
+    if inkset is not None:
+        extratags.append((332, "H", 1, inkset, True))
+    # ExtraSamples (id 338) SOLO si realmente es alfa
+    if extrasamples:
+        extratags.append((338, "H", len(extrasamples), extrasamples, True))
+    if extratags:
+        kws["extratags"] = extratags
+    return kws
+
+def _split_tiles(bands: Iterable[np.ndarray], tile: Tuple[int, int]) -> Iterator[np.ndarray]:
+    """Parte cada banda en mosaicos (th, tw), fila a fila, en el orden que espera tifffile."""
+    th, tw = tile
+    for band in bands:
+        for y in range(0, band.shape[0], th):
+            for x in range(0, band.shape[1], tw):
+                yield band[y:y + th, x:x + tw]
+
+def _u8_chunk_range(block: np.ndarray, channels: list[int]) -> list[tuple[float, float]]:
+    """(min, max) por canal de un bloque, con NaN/inf saneados como en _to_u8."""
+    out = []
+    for ch in channels:
+        x = block[..., ch]
+        if x.dtype.kind == "f":
+            x = np.nan_to_num(x.astype(np.float32, copy=False))
+        if x.size == 0:
+            out.append((np.inf, -np.inf))
+        else:
+            # Extremos en float32, como los vería la conversión del canal
+            out.append((float(np.float32(np.min(x))), float(np.float32(np.max(x)))))
+    return out
+
+def _u8_params(dtype: np.dtype, xmin: float, xmax: float) -> tuple:
     """
-    Convierte un canal 2D a uint8 de forma robusta:
+    Regla de conversión a uint8 de un canal completo:
+    - uint8: igual; uint16: /257 (LUT)
     - float: 0..1 → *255; >255 → clip a 0..65535 y /257; resto → normaliza min-max.
-    - uint16: /257
-    - uint8: retorna igual
     - otros enteros: normaliza min-max
     """
-    ch = np.asarray(ch)
-    if ch.dtype == np.uint8:
-        return ch
-    if ch.dtype == np.uint16:
-        return (ch / 257.0).round().astype(np.uint8)
-    if ch.dtype.kind == "f":
-        x = np.nan_to_num(ch.astype(np.float32, copy=False))
-        if x.size == 0:
-            return np.zeros_like(x, dtype=np.uint8)
-        xmax = float(np.max(x))
-        xmin = float(np.min(x))
+    if dtype == np.uint8:
+        return ("copy",)
+    if dtype == np.uint16:
+        return ("lut",)
+    if dtype.kind == "f":
         if xmax <= 1.05 and xmin >= 0.0:
-            x = np.clip(x, 0.0, 1.0) * 255.0
-            return x.round().astype(np.uint8)
+            return ("unit",)
         if xmax > 255.0:
-            x = np.clip(x, 0.0, 65535.0) / 257.0
-            return x.round().astype(np.uint8)
-        rng = xmax - xmin
-        if rng <= 0.0:
-            return np.zeros_like(x, dtype=np.uint8)
-        x = (x - xmin) * (255.0 / rng)
-        return x.round().astype(np.uint8)
-    # otros enteros (incl. int16, int32, uint32…): normaliza min-max
-    x = ch.astype(np.float32)
-    if x.size == 0:
-        return np.zeros_like(x, dtype=np.uint8)
-    xmax = float(np.max(x))
-    xmin = float(np.min(x))
+            return ("u16",)
     rng = xmax - xmin
-    if rng <= 0.0:
-        return np.zeros_like(x, dtype=np.uint8)
-    x = (x - xmin) * (255.0 / rng)
-    return x.round().astype(np.uint8)
\ No newline at end of file
+    if not rng > 0.0:
+        return ("zero",)
+    return ("minmax", xmin, 255.0 / rng)
+
+def _to_u8(ch: np.ndarray, params: tuple) -> np.ndarray:
+    """Convierte un canal 2D (o un bloque de filas) a uint8 según _u8_params."""
+    kind = params[0]
+    if kind == "copy":
+        return ch
+    if kind == "lut":
+        return np.take(_U16_TO_U8, ch, mode="clip")
+    if kind == "zero":
+        return np.zeros(ch.shape, dtype=np.uint8)
+    x = ch.astype(np.float32, copy=False)
+    if ch.dtype.kind == "f":
+        x = np.nan_to_num(x)
+    if kind == "unit":
+        x = np.clip(x, 0.0, 1.0) * 255.0
+    elif kind == "u16":
+        x = np.clip(x, 0.0, 65535.0) / 257.0
+    else:
+        x = (x - params[1]) * params[2]
+    return x.round().astype(np.uint8)
@@ -0,0 +1,150 @@
+# preview_cache.py
+"""On-disk cache of artwork preview pyramids and metadata, keyed by file content."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Cambiar si cambia el formato o la forma de generar la previsualización
+_FORMAT_VERSION = 1
+# Bytes leídos al inicio, mitad y final del archivo para el hash rápido
+_SAMPLE_BYTES = 64 * 1024
+
+
+def default_cache_dir() -> Path:
+    return Path.home() / ".printervision" / "previews"
+
+
+class PreviewCache:
+    """
+    Directorio de previsualizaciones ya convertidas (pirámide RGBA8 + metadatos del TIF).
+    - Clave: ruta, tamaño, mtime y un hash de muestras del contenido (más `variant`,
+      p.ej. el lado máximo de la previsualización).
+    - Cada entrada es un .npz sin comprimir (carga directa, sin decodificar).
+    - LRU por fecha de acceso con tope `max_bytes`; las entradas más viejas se borran.
+    Todos los errores de disco se tratan como fallo de caché (None / sin guardar).
+    """
+
+    def __init__(self, root: Path | None = None, max_bytes: int = 1024 * 1024 * 1024) -> None:
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+
+    def key(self, path: Path, variant: Any = None) -> Optional[str]:
+        try:
+            path = Path(path).resolve()
+            st = path.stat()
+            h = hashlib.blake2b(digest_size=20)
+            h.update(repr((_FORMAT_VERSION, str(path), st.st_size, st.st_mtime_ns, variant)).encode())
+            with path.open("rb") as f:
+                for pos in (0, st.st_size // 2, max(0, st.st_size - _SAMPLE_BYTES)):
+                    f.seek(pos)
+                    h.update(f.read(_SAMPLE_BYTES))
+            return h.hexdigest()
+        except OSError:
+            return None
+
+    def get(self, path: Path, variant: Any = None) -> Optional[Tuple[Dict[str, Any], List[np.ndarray]]]:
+        """(metadatos, niveles RGBA8) guardados para `path`, o None."""
+        key = self.key(path, variant)
+        if key is None:
+            return None
+        entry = self.root / f"{key}.npz"
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                meta = _decode_meta(str(data["meta"]), data["icc"])
+                levels = [data[f"level_{i}"] for i in range(int(data["count"]))]
+            os.utime(entry)  # marca de uso para el LRU
+        except Exception:
+            return None
+        return meta, levels
+
+    def put(self, path: Path, meta: Dict[str, Any], levels: List[np.ndarray], variant: Any = None) -> bool:
+        key = self.key(path, variant)
+        if key is None:
+            return False
+        entry = self.root / f"{key}.npz"
+        tmp = self.root / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        arrays = {f"level_{i}": np.ascontiguousarray(lv) for i, lv in enumerate(levels)}
+        icc = meta.get("icc_profile")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            np.savez(
+                tmp,
+                meta=np.array(_encode_meta(meta)),
+                icc=np.frombuffer(icc or b"", dtype=np.uint8),
+                count=np.array(len(levels)),
+                **arrays,
+            )
+            os.replace(tmp, entry)  # escritura atómica
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            return False
+        self._evict(keep=entry)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries():
+                entry.unlink(missing_ok=True)
+
+    def size_bytes(self) -> int:
+        return sum(_file_size(e) for e in self._entries())
+
+    def _entries(self) -> List[Path]:
+        try:
+            return [p for p in self.root.glob("*.npz") if not p.name.endswith(".tmp.npz")]
+        except OSError:
+            return []
+
+    def _evict(self, keep: Path | None = None) -> None:
+        """Borra las entradas usadas hace más tiempo hasta quedar bajo max_bytes (salvo `keep`)."""
+        with self._lock:
+            entries = []
+            for e in self._entries():
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e))
+            total = sum(size for _, size, _ in entries)
+            for _, size, e in sorted(entries, key=lambda x: x[0]):
+                if total <= self.max_bytes:
+                    break
+                if e == keep:
+                    continue
+                e.unlink(missing_ok=True)
+                total -= size
+
+
+# --- Helpers internos ---
+
+def _encode_meta(meta: Dict[str, Any]) -> str:
+    plain = {k: v for k, v in meta.items() if k not in ("pixels", "icc_profile")}
+    for k in ("cmyk_order", "shape"):
+        if plain.get(k) is not None:
+            plain[k] = list(plain[k])
+    return json.dumps(plain)
+
+
+def _decode_meta(text: str, icc: np.ndarray) -> Dict[str, Any]:
+    meta = json.loads(text)
+    for k in ("cmyk_order", "shape"):
+        if meta.get(k) is not None:
+            meta[k] = tuple(meta[k])
+    meta["icc_profile"] = icc.tobytes() if icc.size else None
+    return meta
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
@@ -0,0 +1,183 @@
+# threshold.py
+"""Global and tiled (locally adaptive) thresholds for scan-table detection."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.compositor import resolve_workers
+
+# Filas por banda al binarizar con el mapa de umbrales
+_MASK_BAND_ROWS = 512
+
+
+class Thresholds:
+    """
+    Umbral para binarizar el gris desenfocado de un escaneo de H x W:
+    - `level`: un único umbral (Otsu global), o
+    - `grid`: un umbral por mosaico de ~tile px, interpolado bilinealmente entre los
+      centros de los mosaicos. El mapa es continuo, así que binarizar por ROI o por
+      bandas da lo mismo que binarizar la imagen entera: no hay costuras que unir.
+    Un píxel es objeto (255) si su gris es > umbral, como cv2.THRESH_BINARY.
+    """
+
+    def __init__(self, shape: Tuple[int, int], level: float | None = None,
+                 grid: np.ndarray | None = None) -> None:
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.level = level
+        self.grid = grid
+
+    def mask(self, gray: np.ndarray, x0: int = 0, y0: int = 0, step: int = 1,
+             workers: int | None = None) -> np.ndarray:
+        """
+        Máscara 0/255 de `gray`, cuyo píxel (i, j) es el (y0 + i*step, x0 + j*step)
+        del escaneo completo (step > 1 para copias diezmadas con image[::step, ::step]).
+        """
+        if self.grid is None:
+            _, out = cv2.threshold(gray, float(self.level), 255, cv2.THRESH_BINARY)
+            return out
+
+        h, w = gray.shape[:2]
+        out = np.empty((h, w), dtype=np.uint8)
+        gx = _interp_weights(x0 + step * np.arange(w), self.grid.shape[1], self.shape[1])
+        # Umbrales por columna de la rejilla ya interpolados en x: (ny, w)
+        cols = self.grid @ gx.T
+
+        def band(r0: int) -> None:
+            r1 = min(h, r0 + _MASK_BAND_ROWS)
+            gy = _interp_weights(y0 + step * np.arange(r0, r1), self.grid.shape[0], self.shape[0])
+            # gris entero > t  <=>  gris > floor(t): se compara contra un mapa uint8
+            t = np.clip(np.floor(gy @ cols), 0, 255).astype(np.uint8)
+            cv2.compare(gray[r0:r1], t, cv2.CMP_GT, dst=out[r0:r1])
+
+        starts = range(0, h, _MASK_BAND_ROWS)
+        n = min(resolve_workers(workers), len(starts))
+        if n > 1:
+            with ThreadPoolExecutor(max_workers=n) as ex:
+                list(ex.map(band, starts))
+        else:
+            for r0 in starts:
+                band(r0)
+        return out
+
+
+def estimate_thresholds(
+    gray: np.ndarray,
+    shape: Tuple[int, int],
+    step: int = 1,
+    mode: str = "otsu",
+    tile: int = 1024,
+    min_contrast: float = 20.0,
+    workers: int | None = None,
+) -> Thresholds:
+    """
+    Umbrales para un escaneo `shape` (H, W) a partir de `gray`, su gris desenfocado
+    completo o diezmado cada `step` píxeles.
+    - 'otsu': Otsu sobre toda la imagen.
+    - 'tiled': Otsu por mosaico de ~tile px del escaneo, en paralelo. Los mosaicos sin
+      dos clases claras (fondo o prenda de borde a borde: medias separadas menos de
+      `min_contrast` niveles) toman el promedio de sus vecinos válidos; si ninguno es
+      válido se usa el Otsu global.
+    """
+    if mode == "tiled":
+        grid = _tile_grid(gray, shape, step, tile, min_contrast, workers)
+        if grid is not None:
+            return Thresholds(shape, grid=grid)
+    level, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Thresholds(shape, level=float(level))
+
+
+# --- Helpers internos ---
+
+def _tile_grid(gray: np.ndarray, shape: Tuple[int, int], step: int, tile: int,
+               min_contrast: float, workers: int | None) -> Optional[np.ndarray]:
+    h, w = int(shape[0]), int(shape[1])
+    ny, nx = max(1, round(h / tile)), max(1, round(w / tile))
+    # Bordes de los mosaicos en el escaneo, llevados a índices de `gray`
+    ys = np.ceil(np.linspace(0, h, ny + 1) / step).astype(int)
+    xs = np.ceil(np.linspace(0, w, nx + 1) / step).astype(int)
+    cells = [(i, j) for i in range(ny) for j in range(nx)]
+
+    def otsu(cell: Tuple[int, int]) -> Optional[float]:
+        i, j = cell
+        part = gray[ys[i]:ys[i + 1], xs[j]:xs[j + 1]]
+        if part.size == 0:
+            return None
+        hist = cv2.calcHist([part], [0], None, [256], [0, 256]).ravel()
+        return _otsu_hist(hist, min_contrast)
+
+    n = min(resolve_workers(workers), len(cells))
+    if n > 1:
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            levels = list(ex.map(otsu, cells))
+    else:
+        levels = [otsu(c) for c in cells]
+
+    grid = np.array([np.nan if t is None else t for t in levels], dtype=np.float64).reshape(ny, nx)
+    return _fill_invalid(grid)
+
+
+def _otsu_hist(hist: np.ndarray, min_contrast: float) -> Optional[float]:
+    """Umbral de Otsu del histograma (mismo criterio que cv2), o None sin dos clases claras."""
+    total = hist.sum()
+    if total <= 0:
+        return None
+    p = hist / total
+    levels = np.arange(256, dtype=np.float64)
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * levels)
+    mu_t = mu[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma_b = (mu_t * omega - mu) ** 2 / (omega * (1.0 - omega))
+    sigma_b[~np.isfinite(sigma_b)] = -1.0
+    t = int(np.argmax(sigma_b))
+    w0 = omega[t]
+    if sigma_b[t] <= 0 or w0 <= 0.0 or w0 >= 1.0:
+        return None
+    m0 = mu[t] / w0
+    m1 = (mu_t - mu[t]) / (1.0 - w0)
+    if m1 - m0 < min_contrast:
+        return None
+    return float(t)
+
+
+def _fill_invalid(grid: np.ndarray) -> Optional[np.ndarray]:
+    """Rellena los NaN con el promedio de sus vecinos (8-conexos) ya resueltos, capa a capa."""
+    valid = np.isfinite(grid)
+    if not valid.any():
+        return None
+    grid = grid.copy()
+    while not valid.all():
+        padded = np.pad(np.where(valid, grid, 0.0), 1)
+        counts = np.pad(valid.astype(np.float64), 1)
+        acc = np.zeros_like(grid)
+        cnt = np.zeros_like(grid)
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                acc += padded[dy:dy + grid.shape[0], dx:dx + grid.shape[1]]
+                cnt += counts[dy:dy + grid.shape[0], dx:dx + grid.shape[1]]
+        fill = ~valid & (cnt > 0)
+        grid[fill] = acc[fill] / cnt[fill]
+        valid = valid | fill
+    return grid
+
+
+def _interp_weights(coords: np.ndarray, n: int, size: int) -> np.ndarray:
+    """
+    Pesos (len(coords), n) de interpolación lineal entre los centros de n celdas
+    iguales sobre `size` píxeles; fuera del primer/último centro se replica el borde.
+    """
+    u = (np.asarray(coords, dtype=np.float64) + 0.5) * (n / float(size)) - 0.5
+    u = np.clip(u, 0.0, n - 1)
+    i0 = np.floor(u).astype(int)
+    i1 = np.minimum(i0 + 1, n - 1)
+    f = u - i0
+    weights = np.zeros((len(u), n), dtype=np.float64)
+    rows = np.arange(len(u))
+    weights[rows, i0] += 1.0 - f
+    weights[rows, i1] += f
+    return weights
@@ -6,6 +6,8 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QWheelEvent, QPixmap, QPainter
 from PySide6.QtWidgets import QGraphicsPixmapItem, QGraphicsScene, QGraphicsView
 
+from views.scene_items.image_item import ImageItem
+
 class EditorViewer(QGraphicsView):
     """QGraphicsView configured for smooth zooming, panning, and rotation."""
 
@@ -29,7 +31,7 @@ class EditorViewer(QGraphicsView):
             step = 1.0 if dy > 0 else -1.0
 
             for it in self.scene().selectedItems():
-                if it.__class__.__name__ == "ImageItem":
+                if isinstance(it, ImageItem):  # incluye los clones de plantilla
                     c = it.mapFromScene(it.sceneBoundingRect().center())
                     it.setTransformOriginPoint(c)
                     it.setRotation(it.rotation() + step)
@@ -1,8 +1,9 @@
 # contour_item.py
 from __future__ import annotations
+from typing import List, Sequence
 from PySide6.QtGui import QPolygonF, QPen
 from PySide6.QtWidgets import QGraphicsPolygonItem, QGraphicsItem
-from PySide6.QtCore import Qt, QPointF
+from PySide6.QtCore import Qt
 from models.contour_model import ContourModel
 
 class ContourItem(QGraphicsPolygonItem):
@@ -27,10 +28,6 @@ class ContourItem(QGraphicsPolygonItem):
         self.controller.on_selection_changed(self)
 
     @classmethod
-    def from_cv_contour(cls, contour_np) -> "ContourItem":
-        # contour_np: (N,1,2) o (N,2)
-        import numpy as np
-        pts = contour_np.reshape(-1, 2).astype(float)
-        poly = QPolygonF([QPointF(float(x), float(y)) for x, y in pts])
-        m = ContourModel(original_contour=contour_np, scene_contour=poly)
-        return cls(m)
+    def from_cv_contours(cls, contours: Sequence) -> List["ContourItem"]:
+        # Todos los contornos juntos: la geometría se calcula en lote
+        return [cls(m) for m in ContourModel.from_contours(contours)]
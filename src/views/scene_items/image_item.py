@@ -2,31 +2,136 @@
 
 from __future__ import annotations
 
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QPixmap
-from PySide6.QtWidgets import QGraphicsPixmapItem, QGraphicsSceneWheelEvent, QGraphicsItem
+from typing import List, Sequence
+
+from PySide6.QtCore import Qt, QRectF, QSizeF
+from PySide6.QtGui import QPixmap, QPainter, QPainterPath, QPen
+from PySide6.QtWidgets import (
+    QGraphicsPixmapItem,
+    QGraphicsSceneWheelEvent,
+    QGraphicsItem,
+    QStyle,
+    QStyleOptionGraphicsItem,
+)
 
 
 class ImageItem(QGraphicsPixmapItem):
-    """Thin wrapper around :class:`QGraphicsPixmapItem` for editor images."""
+    """
+    Thin wrapper around :class:`QGraphicsPixmapItem` for editor images.
+
+    The item's local coordinates are always master pixels (``image_size``); it
+    may hold a pyramid of smaller preview pixmaps and paints the coarsest one
+    that still covers the current zoom.
+    """
 
     def __init__(self, pixmap: QPixmap | None = None) -> None:
         super().__init__()
         self.controller = None
         self.deletable = True
+        self._levels: List[QPixmap] = []
+        self._rect = QRectF()
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         if pixmap is not None:
-            self.setPixmap(pixmap)
+            self.set_image_pixmap(pixmap)
 
     def set_image_pixmap(self, pixmap: QPixmap | None) -> None:
         """Assign ``pixmap`` to the item, clearing it when ``None``."""
         if pixmap is None or pixmap.isNull():
-            self.setPixmap(QPixmap())
+            self.set_image_levels([], QSizeF())
+            return
+        self.set_image_levels([pixmap], QSizeF(pixmap.size()))
+
+    def set_image_levels(self, levels: Sequence[QPixmap], size: QSizeF) -> None:
+        """
+        Assign a preview pyramid (finest first) drawn over ``size`` master pixels.
+        Pixmaps are implicitly shared, so clones can reuse the same levels.
+        """
+        levels = [pm for pm in levels if pm is not None and not pm.isNull()]
+        self.prepareGeometryChange()
+        self._levels = levels
+        self._rect = QRectF(0.0, 0.0, size.width(), size.height()) if levels else QRectF()
+        self.setPixmap(levels[0] if levels else QPixmap())
+
+    def image_levels(self) -> List[QPixmap]:
+        return list(self._levels)
+
+    def image_size(self) -> QSizeF:
+        return self._rect.size()
+
+    # --- Geometría en píxeles del maestro ---
+    def boundingRect(self) -> QRectF:  # noqa: N802 (Qt naming)
+        if self._rect.isEmpty():
+            return QRectF()
+        if self.flags() & QGraphicsItem.ItemIsSelectable:
+            # Margen de medio píxel para el realce de selección, como QGraphicsPixmapItem
+            return self._rect.adjusted(-0.5, -0.5, 0.5, 0.5)
+        return QRectF(self._rect)
+
+    def shape(self) -> QPainterPath:
+        path = QPainterPath()
+        path.addRect(self._rect)
+        return path
+
+    def contains(self, point) -> bool:
+        return self._rect.contains(point)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        if not self._levels:
             return
-        self.setPixmap(pixmap)
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        pixmap = self._levels[0]
+        # Nivel más pequeño que aún da >= 1 píxel de pantalla por píxel de pixmap
+        for level in reversed(self._levels):
+            if level.width() >= self._rect.width() * lod:
+                pixmap = level
+                break
+        painter.setRenderHint(
+            QPainter.SmoothPixmapTransform,
+            self.transformationMode() == Qt.SmoothTransformation,
+        )
+        painter.drawPixmap(self._rect, pixmap, QRectF(pixmap.rect()))
+        if option.state & QStyle.State_Selected:
+            # Mismo realce de selección que QGraphicsPixmapItem
+            painter.setPen(QPen(option.palette.windowText(), 0, Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self._rect)
 
     def on_selected(self):
         if self.controller is None :
             return
         self.controller.on_selection_changed()
+
+
+class CloneItem(ImageItem):
+    """
+    Lightweight copy of an editor image placed by a template.
+
+    It reuses the source pyramid (``QPixmap`` is implicitly shared, so no pixel
+    data is duplicated) and below ``OUTLINE_MAX_PX`` on screen paints just its
+    frame. No ``DeviceCoordinateCache``: painting already blits a small pyramid
+    level, and keeping one cached pixmap per clone was slower to pan than that.
+    """
+
+    # Lado mayor en pantalla (px) por debajo del cual no se dibuja la imagen
+    OUTLINE_MAX_PX = 24.0
+
+    def __init__(self, levels: Sequence[QPixmap] = (), size: QSizeF | None = None) -> None:
+        super().__init__()
+        if levels:
+            self.set_image_levels(levels, size if size is not None else QSizeF(levels[0].size()))
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        if not self._levels:
+            return
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if max(self._rect.width(), self._rect.height()) * lod >= self.OUTLINE_MAX_PX:
+            super().paint(painter, option, widget)
+            return
+        # Muy alejado: un marco de 1 px dice lo mismo que la imagen y no muestrea nada
+        painter.setPen(QPen(option.palette.mid(), 0))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(self._rect)
+        if option.state & QStyle.State_Selected:
+            painter.setPen(QPen(option.palette.windowText(), 0, Qt.DashLine))
+            painter.drawRect(self._rect)
@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 from pathlib import Path
 import sys
-from PySide6.QtCore import Qt
+from shiboken6 import isValid
+from PySide6.QtCore import QObject, Qt
 from PySide6.QtGui import QAction, QIcon
-from PySide6.QtWidgets import QToolBar, QFileDialog, QMessageBox, QDialog
+from PySide6.QtWidgets import QToolBar, QFileDialog, QMessageBox, QDialog, QProgressDialog
 from controllers.image_controller import ImageController
+from controllers.load_worker import LoadWorker
 from controllers.plantilla_controller import PlantillaController
 from controllers.scan_table_controller import ScanTableController
 from controllers.selection_handler import SelectionHandler
@@ -36,7 +38,15 @@ class MainToolBar(QToolBar):
         self.image_ctrl = image_ctrl
         self.plantilla_ctrl = plantilla_ctrl
         self.sel_handler: SelectionHandler = None
+        self._export_dialog: QProgressDialog | None = None
+        self._export_path: Path | None = None
+        # Diálogo de carga de cada controlador (con el worker que lo alimenta)
+        self._load_dialogs: dict[QObject, tuple[QProgressDialog, LoadWorker, Callable[[int, int], None]]] = {}
         self.setMovable(False)
+        # Resultados de tareas en segundo plano (solo llegan los de la tarea vigente)
+        self.image_ctrl.export_finished.connect(self._on_export_finished)
+        self.image_ctrl.load_finished.connect(self._on_image_loaded)
+        self.scan_table_ctrl.load_finished.connect(self._on_scan_table_loaded)
 
         self.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
 
@@ -78,8 +88,17 @@ class MainToolBar(QToolBar):
         )
         if not file_path:
             return
-        path = Path(file_path)
-        if not self.scan_table_ctrl.load_background(path):
+        worker = self.scan_table_ctrl.load_background_async(Path(file_path))
+        self._show_load_progress(self.scan_table_ctrl, "Cargando tabla de escaneo...", worker,
+                                 self._on_scan_table_load_progress)
+
+    def _on_scan_table_load_progress(self, done: int, total: int) -> None:
+        self._set_load_progress(self.scan_table_ctrl, done, total)
+
+    def _on_scan_table_loaded(self, ok: bool) -> None:
+        if not self._close_load_progress(self.scan_table_ctrl):
+            return
+        if not ok:
             QMessageBox.warning(
                 self,
                 "Error",
@@ -104,8 +123,17 @@ class MainToolBar(QToolBar):
         )
         if not file_path:
             return
-        path = Path(file_path)
-        if not self.image_ctrl.load_image(path):
+        worker = self.image_ctrl.load_image_async(Path(file_path))
+        self._show_load_progress(self.image_ctrl, "Cargando imagen...", worker,
+                                 self._on_image_load_progress)
+
+    def _on_image_load_progress(self, done: int, total: int) -> None:
+        self._set_load_progress(self.image_ctrl, done, total)
+
+    def _on_image_loaded(self, ok: bool) -> None:
+        if not self._close_load_progress(self.image_ctrl):
+            return
+        if not ok:
             QMessageBox.warning(self, "Error", "No se pudo cargar el mosaico .tif seleccionado.")
             return
 
@@ -113,6 +141,46 @@ class MainToolBar(QToolBar):
         self.main_window._update_actions_state()
         self.main_window._update_status()
 
+    def _show_load_progress(self, ctrl: QObject, label: str, worker: LoadWorker,
+                            on_progress: Callable[[int, int], None]) -> None:
+        """
+        Un diálogo por controlador: otra carga del mismo controlador (que ya canceló la
+        anterior al lanzarla) reemplaza su diálogo; la del otro controlador sigue con el suyo.
+        `on_progress` es un método del toolbar (no lambda): así Qt lo encola en la GUI.
+        """
+        self._close_load_progress(ctrl)
+        dialog = QProgressDialog(label, "Cancelar", 0, 0, self)
+        dialog.setWindowTitle("Cargar")
+        dialog.setWindowModality(Qt.NonModal)
+        dialog.setMinimumDuration(300)
+        dialog.canceled.connect(ctrl.cancel_load)
+        dialog.canceled.connect(lambda: self._close_load_progress(ctrl))
+        worker.progress.connect(on_progress)
+        self._load_dialogs[ctrl] = (dialog, worker, on_progress)
+
+    def _set_load_progress(self, ctrl: QObject, done: int, total: int) -> None:
+        entry = self._load_dialogs.get(ctrl)
+        if entry is not None:
+            entry[0].setMaximum(total)
+            entry[0].setValue(done)
+
+    def _close_load_progress(self, ctrl: QObject) -> bool:
+        """Cierra el diálogo de carga de `ctrl`; False si el usuario la había cancelado."""
+        entry = self._load_dialogs.pop(ctrl, None)
+        if entry is None:
+            return True
+        dialog, worker, on_progress = entry
+        # El worker reemplazado no debe seguir escribiendo en el diálogo de la carga nueva
+        if isValid(worker):
+            try:
+                worker.progress.disconnect(on_progress)
+            except (RuntimeError, TypeError):
+                pass
+        cancelled = dialog.wasCanceled()
+        dialog.reset()
+        dialog.deleteLater()
+        return not cancelled
+
     
     def configure_workspace(self) -> None:
         dialog = WorkspaceDialog(
@@ -131,6 +199,9 @@ class MainToolBar(QToolBar):
         if not self.image_ctrl.has_output():
             QMessageBox.information(self, "Sin resultado", "Genera un resultado antes de guardar.")
             return
+        if self.image_ctrl.is_exporting():
+            QMessageBox.information(self, "Guardado en curso", "Espera a que termine el guardado actual.")
+            return
         default_name = "resultado.tif"
         image_path = self.image_ctrl._model._image_path
         if image_path is not None:
@@ -147,13 +218,58 @@ class MainToolBar(QToolBar):
         if not file_path:
             return
         path = Path(file_path)
-        if not self.image_ctrl.save_output(path):
-            QMessageBox.warning(self, "Error", "No se pudo guardar la imagen resultante.")
+        try:
+            worker = self.image_ctrl.start_export(path)
+        except (RuntimeError, ValueError) as exc:
+            QMessageBox.warning(self, "Error", f"No se pudo guardar la imagen resultante.\n{exc}")
             return
-        path = Path(file_path)
+
+        # Progreso no modal: la escena sigue interactiva mientras se escribe
+        dialog = QProgressDialog("Guardando imagen resultante...", "Cancelar", 0, 0, self)
+        dialog.setWindowTitle("Guardar resultado")
+        dialog.setWindowModality(Qt.NonModal)
+        dialog.setMinimumDuration(0)
+        dialog.canceled.connect(self.image_ctrl.cancel_export)
+        self._export_dialog = dialog
+        self._export_path = path
+        # Método del toolbar (no lambda): así Qt lo encola en el hilo de la GUI
+        worker.progress.connect(self._on_export_progress)
+        self.save_action.setEnabled(False)
+        dialog.show()
+
+    def _on_export_progress(self, done: int, total: int) -> None:
+        if self._export_dialog is not None:
+            self._export_dialog.setMaximum(total)
+            self._export_dialog.setValue(done)
+
+    def _on_export_finished(self, ok: bool) -> None:
+        dialog, path = self._export_dialog, self._export_path
+        self._export_dialog = None
+        self._export_path = None
+        self.main_window._update_actions_state()
+        if dialog is None:
+            return  # exportación no iniciada desde el toolbar
+        cancelled = dialog.wasCanceled()
+        dialog.reset()
+        if cancelled:
+            self.main_window.statusBar().showMessage("Guardado cancelado.")
+            return
+        if not ok:
+            msg = "No se pudo guardar la imagen resultante."
+            if self.image_ctrl.last_export_error:
+                msg += f"\n{self.image_ctrl.last_export_error}"
+            QMessageBox.warning(self, "Error", msg)
+            return
+        cfg = load_workspace()
         cfg["last_save_dir"] = str(path.parent)
         save_workspace(cfg)
-        self.main_window.statusBar().showMessage(f"Imagen guardada en: {path}")
+        stats = self.image_ctrl.last_export
+        if stats:
+            self.main_window.statusBar().showMessage(
+                f"Imagen guardada en: {path} ({stats['seconds']:.1f} s, {stats['mb_per_s']:.0f} MB/s)"
+            )
+        else:
+            self.main_window.statusBar().showMessage(f"Imagen guardada en: {path}")
 
     def create_template(self) -> None:
         ctn = self.sel_handler.selected_contours[0]
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Igual que printer_vision.py: el código se importa desde src/
+SRC = Path(__file__).resolve().parent.parent / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,56 @@
+"""Background contour detection: cancellation and parameter snapshots."""
+
+import cv2
+import numpy as np
+import pytest
+
+from controllers.contour_controller import ContourController
+from controllers.load_worker import LoadCancelled
+
+
+def _scan(seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = np.full((3000, 2500, 3), 30, np.uint8)
+    for _ in range(6):
+        box = cv2.boxPoints((
+            (rng.uniform(500, 2000), rng.uniform(500, 2500)),
+            (rng.uniform(300, 500), rng.uniform(200, 300)),
+            rng.uniform(0, 180),
+        )).astype(np.int32)
+        cv2.fillPoly(img, [box], (220, 200, 190))
+    return img
+
+
+def test_detection_can_be_cancelled_between_rois():
+    ctrl = ContourController()
+    calls = []
+
+    def progress(done, total):
+        calls.append((done, total))
+        if done == 2:
+            raise LoadCancelled()
+
+    image = _scan()
+    params = ctrl._detect_params()
+    with pytest.raises(LoadCancelled):
+        ctrl._detect_cached(image, params, progress)
+    assert calls[-1][0] == 2
+    # Lo cancelado no queda en la caché
+    assert ctrl._cache_get((ctrl._digest(image), params)) is None
+
+
+def test_detection_uses_params_snapshot():
+    ctrl = ContourController()
+    image = _scan()
+    params = ctrl._detect_params()
+    expected = len(ContourController()._detect_cached(image, params))
+    assert expected > 0
+
+    def progress(done, total):
+        # Los ajustes cambian mientras la detección corre
+        ctrl._min_area = 1e12
+
+    contours = ctrl._detect_cached(image, params, progress)
+    assert len(contours) == expected
+    assert ctrl._cache_get((ctrl._digest(image), params)) is contours
+    assert ctrl._cache_get((ctrl._digest(image), ctrl._detect_params())) is None
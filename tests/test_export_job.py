@@ -0,0 +1,116 @@
+"""ExportJob writes through a temporary file and never leaves a partial TIF."""
+
+import importlib.util
+
+import numpy as np
+import pytest
+import tifffile
+
+from controllers.export_worker import ExportJob
+from utils.compositor import plan_placement
+
+SHAPE = (64, 48, 4)
+
+
+def _job(path, src, mode="streaming", src_shape=(20, 10, 4)):
+    placements = [plan_placement(src_shape, (32.0, 24.0), 30.0)]
+    return ExportJob(path, src, placements, SHAPE, {}, mode=mode, band_rows=16)
+
+
+@pytest.mark.parametrize("mode", ["streaming", "full", "memmap"])
+def test_export_replaces_destination(tmp_path, mode):
+    out = tmp_path / "out.tif"
+    out.write_bytes(b"previo")
+    src = np.full((20, 10, 4), 200, dtype=np.uint8)
+    job = _job(out, src, mode)
+    assert job.run()
+    assert job.error is None
+    assert tifffile.imread(out).shape == SHAPE
+    assert [p.name for p in tmp_path.iterdir()] == ["out.tif"]
+
+
+def test_cancelled_export_keeps_existing_file(tmp_path):
+    out = tmp_path / "out.tif"
+    out.write_bytes(b"previo")
+    job = _job(out, np.full((20, 10, 4), 200, dtype=np.uint8))
+    job.cancel()
+    assert not job.run()
+    assert job.error is None
+    assert out.read_bytes() == b"previo"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.tif"]
+
+
+@pytest.mark.parametrize("mode", ["streaming", "full", "memmap"])
+def test_failed_export_keeps_existing_file(tmp_path, mode):
+    out = tmp_path / "out.tif"
+    out.write_bytes(b"previo")
+    job = _job(out, np.full((20, 10, 4), 200, dtype=np.uint8), mode)
+
+    def fail(done, total):
+        # Falla a mitad de la composición, con el temporal ya creado
+        raise OSError("disco lleno")
+
+    assert not job.run(fail)
+    assert "disco lleno" in job.error
+    assert out.read_bytes() == b"previo"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.tif"]
+
+
+def test_encoding_error_is_reported(tmp_path):
+    out = tmp_path / "out.tif"
+    job = _job(out, np.full((20, 10, 4), 200, dtype=np.uint8))
+    job.compression = "jpeg2000"
+    assert not job.run()
+    assert "jpeg2000" in job.error
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(importlib.util.find_spec("imagecodecs") is not None,
+                    reason="imagecodecs instalado: zstd funciona")
+def test_missing_codec_is_reported(tmp_path):
+    job = _job(tmp_path / "out.tif", np.full((20, 10, 4), 200, dtype=np.uint8))
+    job.compression = "zstd"
+    assert not job.run()
+    assert "imagecodecs" in job.error
+
+
+def _cached_model(tmp_path, pixels):
+    """ImageModel cuya previsualización sale de la caché: el maestro aún no se leyó."""
+    from models.image_model import ImageModel
+    from utils.preview_cache import PreviewCache
+
+    art = tmp_path / "arte.tif"
+    tifffile.imwrite(art, pixels, photometric="separated")
+    cache = PreviewCache(tmp_path / "cache")
+    first = ImageModel()
+    first.preview_cache = cache
+    assert first.load_image(art)
+    model = ImageModel()
+    model.preview_cache = cache
+    assert model.load_image(art)
+    return model, art
+
+
+def test_cached_preview_loads_pixels_in_job(tmp_path):
+    pixels = np.full((20, 10, 4), 200, dtype=np.uint8)
+    model, _ = _cached_model(tmp_path, pixels)
+    src = model.pixels_source()
+    assert callable(src)
+    assert model.pixel_shape == pixels.shape
+
+    out = tmp_path / "out.tif"
+    job = _job(out, src)
+    assert job.run()
+    model.adopt_pixels(job.src_loader, job.src)
+    assert model.pixels_source() is job.src
+    np.testing.assert_array_equal(model.pixels, pixels)
+
+
+def test_cached_preview_of_changed_file_reports_error(tmp_path):
+    model, art = _cached_model(tmp_path, np.full((20, 10, 4), 200, dtype=np.uint8))
+    tifffile.imwrite(art, np.zeros((30, 10, 4), dtype=np.uint8), photometric="separated")
+
+    job = _job(tmp_path / "out.tif", model.pixels_source())
+    assert not job.run()
+    assert "arte.tif" in job.error
+    assert not (tmp_path / "out.tif").exists()
@@ -0,0 +1,50 @@
+"""Template assignment by shape signature."""
+
+import cv2
+import numpy as np
+import pytest
+
+from controllers.plantilla_controller import _SignatureIndex
+from models.contour_model import contour_geometry
+
+SIZES = (1.0, 1.1, 1.21)   # talles separados un 10 %
+
+
+def _contour(kind: str, scale: float, rng: np.random.Generator) -> np.ndarray:
+    """Contorno ruidoso de una forma simétrica respecto de su centro, rotada al azar."""
+    w, h = 600.0 * scale, 400.0 * scale
+    t = np.linspace(0.0, 2 * np.pi, 720, endpoint=False)
+    if kind == "ellipse":
+        pts = np.column_stack([w / 2 * np.cos(t), h / 2 * np.sin(t)])
+    else:
+        # Rectángulo muestreado por su perímetro
+        c, s = np.cos(t), np.sin(t)
+        r = 1.0 / np.maximum(np.abs(c) / (w / 2), np.abs(s) / (h / 2))
+        pts = np.column_stack([r * c, r * s])
+    pts += rng.normal(0.0, 1.5, pts.shape)
+    a = rng.uniform(0.0, 2 * np.pi)
+    rot = np.array([[np.cos(a), -np.sin(a)], [np.sin(a), np.cos(a)]])
+    return np.round(pts @ rot.T + 1000.0).astype(np.int32).reshape(-1, 1, 2)
+
+
+@pytest.mark.parametrize("kind", ["rectangle", "ellipse"])
+def test_symmetric_shape_sizes_go_to_matching_template(kind):
+    rng = np.random.default_rng(7)
+    templates = contour_geometry([_contour(kind, s, rng) for s in SIZES])["signature"]
+    index = _SignatureIndex(templates)
+
+    contours, expected = [], []
+    for k, s in enumerate(SIZES):
+        for _ in range(30):
+            contours.append(_contour(kind, s, rng))
+            expected.append(k)
+    assigned = index.nearest(contour_geometry(contours)["signature"])
+
+    assert np.array_equal(assigned, np.array(expected))
+
+
+def test_signature_is_rotation_invariant():
+    box = cv2.boxPoints(((500.0, 500.0), (300.0, 120.0), 0.0))
+    rot = cv2.boxPoints(((500.0, 500.0), (300.0, 120.0), 37.0))
+    sig = contour_geometry([box, rot])["signature"]
+    assert np.allclose(sig[0], sig[1], atol=1e-2)